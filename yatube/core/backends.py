@@ -0,0 +1,86 @@
+"""
+Бэкенды кэша и шаблонов, которые сообщают о себе в core.metrics.
+
+Вне запроса (команды, фоновые потоки) они ведут себя как обёрнутые
+бэкенды без накладных расходов.
+"""
+import time
+
+from django.template import TemplateDoesNotExist
+from django.template.backends import django as django_backend
+from django.utils.module_loading import import_string
+
+from . import metrics
+
+MISSING = object()
+
+
+class InstrumentedCache:
+    """
+    Обёртка над настоящим бэкендом кэша из OPTIONS['BACKEND'],
+    считает попадания и промахи get, get_many и has_key.
+    """
+    def __init__(self, location, params):
+        params = dict(params)
+        options = dict(params.get('OPTIONS', {}))
+        backend = import_string(options.pop('BACKEND'))
+        params['OPTIONS'] = options
+        self._cache = backend(location, params)
+
+    def __getattr__(self, name):
+        if name == '_cache':
+            raise AttributeError(name)
+        return getattr(self._cache, name)
+
+    def __contains__(self, key):
+        return self.has_key(key)
+
+    @staticmethod
+    def record(hits, misses):
+        request_metrics = metrics.current()
+        if request_metrics is not None:
+            request_metrics.cache_hits += hits
+            request_metrics.cache_misses += misses
+
+    def get(self, key, default=None, version=None):
+        value = self._cache.get(key, MISSING, version=version)
+        if value is MISSING:
+            self.record(0, 1)
+            return default
+        self.record(1, 0)
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        values = self._cache.get_many(keys, version=version)
+        self.record(len(values), len(keys) - len(values))
+        return values
+
+    def has_key(self, key, version=None):
+        found = self._cache.has_key(key, version=version)
+        self.record(int(found), int(not found))
+        return found
+
+
+class Template(django_backend.Template):
+    def render(self, context=None, request=None):
+        request_metrics = metrics.current()
+        if request_metrics is None:
+            return super().render(context, request)
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            request_metrics.template_time += time.perf_counter() - start
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """Шаблонизатор Django, который замеряет время рендеринга."""
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            django_backend.reraise(exc, self)
@@ -0,0 +1,100 @@
+"""
+Чтение из кэша с защитой от «набега» (cache stampede).
+
+Значение хранится вместе со временем вычисления и логическим сроком
+жизни. Чем ближе срок и чем дороже вычисление, тем выше вероятность,
+что очередной запрос пересчитает значение заранее (probabilistic
+early expiration). Пересчитывает только тот процесс, который взял
+блокировку через cache.add; остальные отдают прежнее значение или
+недолго ждут нового. Это верно только для бэкендов с атомарным add
+(locmem, memcached); у FileBasedCache проверка и запись
+разделены, и блокировку могут взять сразу несколько процессов.
+Физически запись живёт дольше логического срока, чтобы старое
+значение было что отдать во время пересчёта.
+
+Блокировка хранит случайный токен взявшего её процесса. Если пересчёт
+шёл дольше LOCK_TIMEOUT, блокировку мог взять другой процесс, и
+снимать её за него нельзя.
+"""
+import math
+import random
+import time
+from uuid import uuid4
+
+from django.core.cache import cache
+
+BETA = 1.0
+LOCK_TIMEOUT = 10
+WAIT_TIMEOUT = 2
+WAIT_STEP = 0.05
+STALE_FACTOR = 2
+
+
+def lock_key(key):
+    return f'{key}:lock'
+
+
+def release_lock(key, token):
+    """Снимает блокировку, только если она всё ещё наша."""
+    if cache.get(lock_key(key)) == token:
+        cache.delete(lock_key(key))
+
+
+def should_recompute(delta, expires_at, beta=BETA):
+    return time.time() - delta * beta * math.log(random.random()) >= expires_at
+
+
+def store(key, value, delta, timeout):
+    cache.set(
+        key,
+        (value, delta, time.time() + timeout),
+        timeout * STALE_FACTOR
+    )
+
+
+def compute_and_store(key, compute, timeout):
+    start = time.time()
+    value = compute()
+    store(key, value, time.time() - start, timeout)
+    return value
+
+
+def wait_for_value(key):
+    deadline = time.time() + WAIT_TIMEOUT
+    while time.time() < deadline:
+        time.sleep(WAIT_STEP)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+    return None
+
+
+def get_or_compute(key, compute, timeout, beta=BETA):
+    """
+    Возвращает значение по ключу, вычисляя его через compute().
+
+    timeout=None означает бессрочное значение: тогда это обычный
+    get/set, так как досрочно пересчитывать нечего.
+    """
+    if timeout is None:
+        value = cache.get(key)
+        if value is None:
+            value = compute()
+            cache.set(key, value, None)
+        return value
+    entry = cache.get(key)
+    if entry is not None:
+        value, delta, expires_at = entry
+        if not should_recompute(delta, expires_at, beta):
+            return value
+    token = uuid4().hex
+    if not cache.add(lock_key(key), token, LOCK_TIMEOUT):
+        if entry is None:
+            entry = wait_for_value(key)
+        if entry is not None:
+            return entry[0]
+        return compute()
+    try:
+        return compute_and_store(key, compute, timeout)
+    finally:
+        release_lock(key, token)
@@ -0,0 +1,71 @@
+"""
+SQLite в боевом режиме.
+
+apply_pragmas выполняет settings.SQLITE_PRAGMAS для каждого нового
+соединения. В режиме WAL читатели не ждут писателя, а писатель —
+читателей; synchronous=NORMAL в WAL не теряет целостность, но
+избавляет от fsync на каждый коммит.
+
+Писатель в SQLite всё равно один на всю базу. Если транзакция начала
+с чтения и потом пишет, а другой процесс уже держит блокировку
+записи, SQLite отвечает «database is locked» сразу, не дожидаясь
+timeout. serialized_write выполняет запись одной транзакцией и при
+такой ошибке повторяет её с экспоненциальной задержкой. Внутри
+процесса записи идут по очереди через WRITE_LOCK, чтобы потоки не
+отбирали блокировку друг у друга. Поэтому view оборачивает в
+serialized_write только сами записи в базу: разбор формы, обработка
+картинки и шаблоны выполняются без блокировки и не повторяются.
+"""
+import random
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+
+RETRIES = 5
+BACKOFF = 0.05
+LOCKED_ERRORS = (OperationalError, sqlite3.OperationalError)
+WRITE_LOCK = threading.RLock()
+
+
+def apply_pragmas(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def is_locked(error):
+    message = str(error)
+    return 'locked' in message or 'busy' in message
+
+
+def backoff(attempt):
+    return BACKOFF * 2 ** attempt * random.uniform(0.5, 1.5)
+
+
+def call_with_retries(func, *args, **kwargs):
+    """Вызывает func, повторяя её, пока база занята другим писателем."""
+    for attempt in range(RETRIES):
+        try:
+            with WRITE_LOCK:
+                return func(*args, **kwargs)
+        except LOCKED_ERRORS as error:
+            if not is_locked(error) or attempt == RETRIES - 1:
+                raise
+        time.sleep(backoff(attempt))
+
+
+def serialized_write(func, *args, **kwargs):
+    """Выполняет запись func одной транзакцией с повтором при блокировке."""
+    if connection.in_atomic_block:
+        return func(*args, **kwargs)
+
+    def run():
+        with transaction.atomic():
+            return func(*args, **kwargs)
+
+    return call_with_retries(run)
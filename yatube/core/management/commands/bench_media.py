@@ -0,0 +1,83 @@
+import os
+import shutil
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory, override_settings
+from django.views.static import serve
+
+from core.media import serve_media
+
+NAME = 'posts/bench.jpg'
+
+
+def consume(response):
+    size = sum(len(chunk) for chunk in response)
+    response.close()
+    return size
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность serve_media и '
+        'django.views.static.serve на одном файле.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=2 * 2 ** 20)
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--range', type=int, default=64 * 2 ** 10)
+
+    def handle(self, *args, **options):
+        root = tempfile.mkdtemp()
+        try:
+            path = os.path.join(root, NAME)
+            os.makedirs(os.path.dirname(path))
+            with open(path, 'wb') as file:
+                file.write(os.urandom(options['size']))
+            with override_settings(MEDIA_ROOT=root):
+                self.run(root, options)
+        finally:
+            shutil.rmtree(root)
+
+    def run(self, root, options):
+        factory = RequestFactory()
+        first = serve_media(factory.get('/'), NAME)
+        consume(first)
+        static_first = serve(factory.get('/'), NAME, document_root=root)
+        consume(static_first)
+        scenarios = (
+            ('Весь файл', {}, {}),
+            (
+                f'Range: первые {options["range"]} байт',
+                {'HTTP_RANGE': f'bytes=0-{options["range"] - 1}'},
+                {'HTTP_RANGE': f'bytes=0-{options["range"] - 1}'},
+            ),
+            (
+                'Повторная проверка (304)',
+                {'HTTP_IF_NONE_MATCH': first['ETag']},
+                {'HTTP_IF_MODIFIED_SINCE': static_first['Last-Modified']},
+            ),
+        )
+        views = (
+            ('serve_media', lambda request: serve_media(request, NAME)),
+            ('static.serve', lambda request: serve(
+                request, NAME, document_root=root
+            )),
+        )
+        for title, *headers in scenarios:
+            self.stdout.write(title)
+            for (label, view), view_headers in zip(views, headers):
+                request = factory.get('/', **view_headers)
+                total = 0
+                start = time.perf_counter()
+                for _ in range(options['requests']):
+                    response = view(request)
+                    total += consume(response)
+                elapsed = time.perf_counter() - start
+                self.stdout.write(
+                    f'  {label:<13} {options["requests"] / elapsed:8.0f} '
+                    f'запр/с  {total / elapsed / 2 ** 20:8.1f} МБ/с  '
+                    f'{total // options["requests"]} байт на ответ'
+                )
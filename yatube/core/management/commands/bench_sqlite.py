@@ -0,0 +1,162 @@
+import os
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.db import LOCKED_ERRORS, call_with_retries, is_locked
+
+SCHEMA = """
+CREATE TABLE comment (
+    id INTEGER PRIMARY KEY,
+    post_id INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    created REAL NOT NULL
+);
+CREATE INDEX comment_post_idx ON comment (post_id, id);
+CREATE TABLE post (id INTEGER PRIMARY KEY, comments_count INTEGER);
+"""
+POSTS = 100
+READ = (
+    'SELECT id, text, created FROM comment WHERE post_id = ? '
+    'ORDER BY id DESC LIMIT 20'
+)
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+def connect(path, pragmas, timeout):
+    db = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+    for name, value in pragmas.items():
+        db.execute(f'PRAGMA {name} = {value}')
+    return db
+
+
+def write_comment(db, number):
+    """Как add_comment: комментарий и счётчик поста одной транзакцией."""
+    post_id = number % POSTS
+    db.execute('BEGIN')
+    try:
+        db.execute(
+            'INSERT INTO comment (post_id, text, created) VALUES (?, ?, ?)',
+            (post_id, 'комментарий ' * 10, time.time())
+        )
+        db.execute(
+            'UPDATE post SET comments_count = comments_count + 1 '
+            'WHERE id = ?',
+            (post_id,)
+        )
+        db.execute('COMMIT')
+    except BaseException:
+        db.execute('ROLLBACK')
+        raise
+
+
+def read_comments(db, number):
+    db.execute(READ, (number % POSTS,)).fetchall()
+
+
+def write_with_retries(db, number):
+    call_with_retries(write_comment, db, number)
+
+
+def load(operation, path, pragmas, timeout, deadline, number, timings,
+         errors):
+    """
+    Выполняет operation(db, number) до deadline на своём соединении,
+    копит длительности успешных операций и ошибки блокировки.
+    """
+    db = connect(path, pragmas, timeout)
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            operation(db, number)
+        except LOCKED_ERRORS as error:
+            if not is_locked(error):
+                raise
+            errors.append(error)
+            continue
+        timings.append(time.perf_counter() - start)
+        number += 1
+    db.close()
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагружает отдельную базу SQLite читателями и писателями '
+        'одновременно и сравнивает обычный и боевой профили.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=3)
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--rows', type=int, default=20000)
+
+    def handle(self, *args, **options):
+        profiles = (
+            ('development', {}, 5),
+            ('production', settings.SQLITE_PRODUCTION_PRAGMAS, 20),
+        )
+        for label, pragmas, timeout in profiles:
+            with tempfile.TemporaryDirectory() as root:
+                path = os.path.join(root, 'bench.sqlite3')
+                self.seed(path, options['rows'])
+                self.run(label, path, pragmas, timeout, options)
+
+    def seed(self, path, rows):
+        db = sqlite3.connect(path)
+        db.executescript(SCHEMA)
+        db.executemany(
+            'INSERT INTO post VALUES (?, 0)', ((i,) for i in range(POSTS))
+        )
+        db.executemany(
+            'INSERT INTO comment (post_id, text, created) VALUES (?, ?, ?)',
+            ((i % POSTS, 'комментарий', time.time()) for i in range(rows))
+        )
+        db.commit()
+        db.close()
+
+    def run(self, label, path, pragmas, timeout, options):
+        deadline = time.perf_counter() + options['seconds']
+        reads = []
+        writes = []
+        errors = []
+        threads = [
+            threading.Thread(target=load, args=(
+                operation, path, pragmas, timeout, deadline, number,
+                timings, errors
+            ))
+            for operation, timings, count in (
+                (read_comments, reads, options['readers']),
+                (write_with_retries, writes, options['writers']),
+            )
+            for number in range(count)
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.report(label, time.perf_counter() - started, reads, writes,
+                    errors)
+
+    def report(self, label, elapsed, reads, writes, errors):
+        self.stdout.write(label)
+        for title, timings in (('чтение', reads), ('запись', writes)):
+            if not timings:
+                self.stdout.write(f'  {title}: ни одной операции')
+                continue
+            self.stdout.write(
+                f'  {title} {len(timings) / elapsed:8.0f} оп/с  '
+                f'p50 {statistics.median(timings) * 1000:7.2f} мс  '
+                f'p99 {percentile(timings, 0.99) * 1000:7.2f} мс'
+            )
+        self.stdout.write(f'  ошибок «database is locked»: {len(errors)}')
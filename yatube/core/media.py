@@ -0,0 +1,167 @@
+"""
+Раздача файлов из MEDIA_ROOT.
+
+В отличие от django.views.static.serve, который подключается только
+при DEBUG, view годится для боевого режима:
+
+* условные запросы по ETag и Last-Modified отвечают 304 без тела;
+* Range: bytes=… отдаёт часть файла (206), в том числе с If-Range;
+* файлы, названные SHA-256 содержимого (см. posts/storage.py), никогда
+  не меняются, поэтому кэшируются на год с immutable, остальные —
+  на MAX_AGE;
+* тело отдаётся через FileResponse: сервер с wsgi.file_wrapper
+  (например, gunicorn) передаёт файл через sendfile без копирования
+  в Python, в том числе для диапазонов.
+"""
+import mimetypes
+import os
+import re
+import stat
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+MAX_AGE = 60 * 60
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+BLOCK_SIZE = 64 * 2 ** 10
+CONTENT_HASH = re.compile(r'^([0-9a-f]{64})\.\w+$')
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class FileRange:
+    """
+    Часть открытого файла. read() не выходит за конец диапазона,
+    а fileno() позволяет серверу отправить её через sendfile:
+    файл уже стоит на начале диапазона, длину задаёт Content-Length.
+    """
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """
+    Возвращает (start, end) включительно для одного диапазона.
+
+    None означает, что заголовок нужно проигнорировать и отдать файл
+    целиком (так же поступаем с несколькими диапазонами).
+    ValueError — диапазон не пересекается с файлом.
+    """
+    match = RANGE.match(header.strip())
+    if match is None:
+        return None
+    start, end = match.groups()
+    if not start:
+        if not end:
+            return None
+        if int(end) == 0 or size == 0:
+            raise ValueError(header)
+        return max(size - int(end), 0), size - 1
+    start = int(start)
+    if end and int(end) < start:
+        return None
+    if start >= size:
+        raise ValueError(header)
+    end = min(int(end), size - 1) if end else size - 1
+    return start, end
+
+
+def range_applies(request, etag, mtime):
+    """Проверяет If-Range: диапазон действует, только если файл не менялся."""
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range is None:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == int(mtime)
+
+
+def content_hash(path):
+    match = CONTENT_HASH.match(os.path.basename(path))
+    return match and match.group(1)
+
+
+def file_response(request, full_path, info, etag):
+    size = info.st_size
+    content_type = mimetypes.guess_type(full_path)[0]
+    content_type = content_type or 'application/octet-stream'
+    byte_range = None
+    header = request.META.get('HTTP_RANGE')
+    if header and range_applies(request, etag, info.st_mtime):
+        try:
+            byte_range = parse_range(header, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+    if byte_range is None:
+        response = FileResponse(
+            open(full_path, 'rb'), content_type=content_type
+        )
+        response.block_size = BLOCK_SIZE
+        return response
+    start, end = byte_range
+    length = end - start + 1
+    response = FileResponse(
+        FileRange(open(full_path, 'rb'), start, length),
+        content_type=content_type,
+        status=206,
+    )
+    response.block_size = BLOCK_SIZE
+    response['Content-Length'] = length
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    try:
+        info = os.stat(full_path)
+    except OSError:
+        raise Http404
+    if not stat.S_ISREG(info.st_mode):
+        raise Http404
+    digest = content_hash(path)
+    if digest:
+        etag = f'"{digest}"'
+        max_age = f'max-age={IMMUTABLE_MAX_AGE}, immutable'
+    else:
+        etag = f'"{info.st_size:x}-{info.st_mtime_ns:x}"'
+        max_age = f'max-age={MAX_AGE}'
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(info.st_mtime),
+        'Cache-Control': f'public, {max_age}',
+        'Accept-Ranges': 'bytes',
+    }
+    response = get_conditional_response(
+        request, etag=etag, last_modified=int(info.st_mtime)
+    )
+    if response is None:
+        response = file_response(request, full_path, info, etag)
+    for header, value in headers.items():
+        response[header] = value
+    return response
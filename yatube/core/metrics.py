@@ -0,0 +1,152 @@
+"""
+Метрики стоимости запросов.
+
+MetricsMiddleware (core/middleware.py) заводит на запрос объект
+RequestMetrics. Его заполняют:
+
+* SQL — обёртка connection.execute_wrapper: число запросов и время;
+* шаблоны — бэкенд core.backends.DjangoTemplates: время рендеринга;
+* кэш — бэкенд core.backends.InstrumentedCache: попадания и промахи.
+
+Итог запроса уходит клиенту в заголовке Server-Timing и копится по
+имени view в REGISTRY, который отдаёт endpoint /metrics в текстовом
+формате Prometheus. Это только счётчики и пара вызовов perf_counter,
+поэтому сбор можно держать включённым в бою. Реестр свой у каждого
+процесса: при нескольких воркерах каждый отдаёт свои значения.
+"""
+import threading
+import time
+from collections import defaultdict
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+PREFIX = 'yatube'
+
+state = threading.local()
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.duration = 0
+        self.queries = 0
+        self.sql_time = 0
+        self.template_time = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.sql_time += time.perf_counter() - start
+
+    def finish(self):
+        self.duration = time.perf_counter() - self.started
+
+    def server_timing(self):
+        return ', '.join((
+            f'app;dur={self.duration * 1000:.1f}',
+            f'db;dur={self.sql_time * 1000:.1f};desc="{self.queries} queries"',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+            f'cache;desc="hit={self.cache_hits} miss={self.cache_misses}"',
+        ))
+
+
+def current():
+    return getattr(state, 'metrics', None)
+
+
+def begin():
+    state.metrics = RequestMetrics()
+    return state.metrics
+
+
+def end():
+    state.metrics = None
+
+
+class ViewStats:
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.count = 0
+        self.duration = 0
+        self.queries = 0
+        self.sql_time = 0
+        self.template_time = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+
+class Registry:
+    """Накопленные метрики по именам view."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = defaultdict(ViewStats)
+
+    def observe(self, view, metrics):
+        with self.lock:
+            stats = self.views[view]
+            for index, bound in enumerate(BUCKETS):
+                if metrics.duration <= bound:
+                    stats.buckets[index] += 1
+            stats.count += 1
+            stats.duration += metrics.duration
+            stats.queries += metrics.queries
+            stats.sql_time += metrics.sql_time
+            stats.template_time += metrics.template_time
+            stats.cache_hits += metrics.cache_hits
+            stats.cache_misses += metrics.cache_misses
+
+    def clear(self):
+        with self.lock:
+            self.views.clear()
+
+    def render(self):
+        """Текстовый формат Prometheus 0.0.4."""
+        with self.lock:
+            views = sorted(
+                (view, vars(stats).copy())
+                for view, stats in self.views.items()
+            )
+        name = f'{PREFIX}_request_duration_seconds'
+        lines = [
+            f'# HELP {name} Wall time of a request by view.',
+            f'# TYPE {name} histogram',
+        ]
+        for view, stats in views:
+            for bound, count in zip(BUCKETS, stats['buckets']):
+                lines.append(
+                    f'{name}_bucket{{view="{view}",le="{bound}"}} {count}'
+                )
+            lines += [
+                f'{name}_bucket{{view="{view}",le="+Inf"}} {stats["count"]}',
+                f'{name}_sum{{view="{view}"}} {stats["duration"]:.6f}',
+                f'{name}_count{{view="{view}"}} {stats["count"]}',
+            ]
+        counters = (
+            ('db_queries_total', 'queries', 'SQL queries.'),
+            ('db_query_seconds_total', 'sql_time', 'Time spent in SQL.'),
+            (
+                'template_render_seconds_total',
+                'template_time',
+                'Time spent rendering templates.',
+            ),
+            ('cache_hits_total', 'cache_hits', 'Cache hits.'),
+            ('cache_misses_total', 'cache_misses', 'Cache misses.'),
+        )
+        for suffix, field, description in counters:
+            name = f'{PREFIX}_{suffix}'
+            lines += [
+                f'# HELP {name} {description}',
+                f'# TYPE {name} counter',
+            ]
+            lines += [
+                f'{name}{{view="{view}"}} {stats[field]:g}'
+                for view, stats in views
+            ]
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
@@ -0,0 +1,93 @@
+import os
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from . import metrics, profiling
+from .routers import STICKY_COOKIE, has_written, reset_writes
+
+
+class MetricsMiddleware:
+    """Замеряет стоимость запроса, см. core/metrics.py."""
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request_metrics = metrics.begin()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(
+                        request_metrics.execute_wrapper
+                    ))
+                response = self.get_response(request)
+            request_metrics.finish()
+        finally:
+            metrics.end()
+        match = request.resolver_match
+        metrics.REGISTRY.observe(
+            match.view_name if match else 'unresolved', request_metrics
+        )
+        if settings.METRICS_SERVER_TIMING:
+            response['Server-Timing'] = request_metrics.server_timing()
+        return response
+
+
+class ProfilerMiddleware:
+    """Сэмплирует стеки и сохраняет профиль медленного запроса.
+
+    См. core/profiling.py.
+    """
+    def __init__(self, get_response):
+        if not settings.PROFILER_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        forced = profiling.requested(request)
+        thread_id = threading.get_ident()
+        profile = profiling.SAMPLER.add(thread_id, force=forced)
+        if profile is None:
+            return self.get_response(request)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiling.SAMPLER.remove(thread_id)
+        duration = time.perf_counter() - start
+        if forced or (
+            duration >= settings.PROFILER_THRESHOLD
+            and profiling.DUMPS.allow(
+                settings.PROFILER_MAX_DUMPS, settings.PROFILER_PERIOD
+            )
+        ):
+            match = request.resolver_match
+            path = profiling.save(
+                profile, match.view_name if match else 'unresolved', duration
+            )
+            if forced:
+                response['X-Profile'] = os.path.basename(path)
+        return response
+
+
+class ReplicaStickinessMiddleware:
+    """После записи пользователь читает из default, пока реплики догоняют."""
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        reset_writes()
+        response = self.get_response(request)
+        if settings.READ_REPLICAS and has_written():
+            response.set_cookie(
+                STICKY_COOKIE,
+                '1',
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
@@ -0,0 +1,154 @@
+"""
+Выборочный профилировщик медленных запросов.
+
+Включается PROFILER_ENABLED. ProfilerMiddleware (core/middleware.py)
+регистрирует поток запроса в SAMPLER: один фоновый поток раз в
+PROFILER_INTERVAL секунд снимает стеки зарегистрированных потоков
+через sys._current_frames() и копит их в свёрнутом виде. В отличие от
+cProfile запрос не трассируется и почти не замедляется, а одновременно
+сэмплируется не больше PROFILER_MAX_ACTIVE запросов.
+
+Стеки сохраняются, если запрос шёл дольше PROFILER_THRESHOLD секунд
+или пришёл с заголовком X-Profile, равным PROFILER_TOKEN. Файл
+PROFILER_DIR/<время>-<view>-<мс>ms.folded записан в формате collapsed
+stacks («кадр;кадр;кадр число»), его открывают speedscope и
+flamegraph.pl. По порогу пишется не больше PROFILER_MAX_DUMPS файлов
+за PROFILER_PERIOD секунд на процесс; запросы с токеном этот лимит не
+расходуют.
+"""
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+from functools import lru_cache
+
+from django.conf import settings
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+MAX_DEPTH = 128
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def short_path(filename):
+    """Путь файла относительно самого длинного подходящего sys.path."""
+    roots = [
+        root for root in sys.path
+        if root and filename.startswith(root + os.sep)
+    ]
+    if not roots:
+        return filename
+    return os.path.relpath(filename, max(roots, key=len))
+
+
+def fold(frame):
+    """Стек кадра одной строкой от корня к листу."""
+    names = []
+    while frame is not None and len(names) < MAX_DEPTH:
+        code = frame.f_code
+        names.append(
+            f'{code.co_name} ({short_path(code.co_filename)}:'
+            f'{code.co_firstlineno})'.replace(';', ':')
+        )
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class Sampler:
+    """Фоновый поток, снимающий стеки зарегистрированных потоков."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.profiles = {}
+        self.thread = None
+
+    def add(self, thread_id, force=False):
+        """Начинает копить стеки потока; None, если мест нет."""
+        with self.lock:
+            if (
+                not force
+                and len(self.profiles) >= settings.PROFILER_MAX_ACTIVE
+            ):
+                return None
+            profile = self.profiles[thread_id] = Counter()
+            if self.thread is None:
+                self.thread = threading.Thread(
+                    target=self.run, name='profiler', daemon=True
+                )
+                self.thread.start()
+            return profile
+
+    def remove(self, thread_id):
+        with self.lock:
+            self.profiles.pop(thread_id, None)
+
+    def run(self):
+        """Работает, пока есть кого сэмплировать."""
+        while True:
+            time.sleep(settings.PROFILER_INTERVAL)
+            with self.lock:
+                if not self.profiles:
+                    self.thread = None
+                    return
+                thread_ids = list(self.profiles)
+            frames = sys._current_frames()
+            stacks = [
+                (thread_id, fold(frames[thread_id]))
+                for thread_id in thread_ids
+                if thread_id in frames
+            ]
+            del frames
+            with self.lock:
+                for thread_id, stack in stacks:
+                    profile = self.profiles.get(thread_id)
+                    if profile is not None:
+                        profile[stack] += 1
+
+
+class RateLimit:
+    """Не больше limit событий за скользящие period секунд."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.times = deque()
+
+    def allow(self, limit, period):
+        now = time.monotonic()
+        with self.lock:
+            while self.times and now - self.times[0] >= period:
+                self.times.popleft()
+            if len(self.times) >= limit:
+                return False
+            self.times.append(now)
+            return True
+
+
+SAMPLER = Sampler()
+DUMPS = RateLimit()
+
+
+def requested(request):
+    """Запрос просит профиль заголовком X-Profile с верным токеном."""
+    token = settings.PROFILER_TOKEN
+    return bool(token) and request.META.get(PROFILE_HEADER) == token
+
+
+def save(profile, view, duration):
+    """Пишет свёрнутые стеки в PROFILER_DIR и возвращает путь файла."""
+    os.makedirs(settings.PROFILER_DIR, exist_ok=True)
+    name = '{}-{}-{}ms.folded'.format(
+        datetime.now().strftime('%Y%m%dT%H%M%S.%f'),
+        re.sub(r'[^\w.-]', '_', view),
+        round(duration * 1000),
+    )
+    path = os.path.join(settings.PROFILER_DIR, name)
+    with open(path, 'w') as file:
+        for stack, count in profile.most_common():
+            file.write(f'{stack} {count}\n')
+    logger.warning(
+        'Запрос %s шёл %.0f мс, профиль: %s', view, duration * 1000, path
+    )
+    return path
@@ -0,0 +1,71 @@
+"""
+Чтение лент из реплик базы.
+
+Реплики перечислены в settings.READ_REPLICAS. View, обёрнутое в
+replica_reads, выбирает одну случайную реплику на весь запрос, и
+ReplicaRouter направляет туда чтения. Запись и всё остальное всегда
+идут в default.
+
+Реплика может отставать, поэтому после своей записи пользователь
+какое-то время читает из default. ReplicaRouter отмечает каждую
+запись в default, и если запрос что-то записал — неважно, каким
+методом: подписка, например, приходит по GET-ссылке, —
+ReplicaStickinessMiddleware (core/middleware.py) ставит cookie
+STICKY_COOKIE на REPLICA_STICKY_SECONDS. replica_reads с такой
+cookie реплику не выбирает.
+"""
+import random
+import threading
+from functools import wraps
+
+from django.conf import settings
+
+STICKY_COOKIE = 'db_sticky'
+SAFE_METHODS = ('GET', 'HEAD')
+
+state = threading.local()
+
+
+def current_replica():
+    return getattr(state, 'alias', None)
+
+
+def reset_writes():
+    state.wrote = False
+
+
+def has_written():
+    return getattr(state, 'wrote', False)
+
+
+def replica_reads(view):
+    """Чтения внутри view идут в реплику, если она настроена."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if (
+            not settings.READ_REPLICAS
+            or request.method not in SAFE_METHODS
+            or STICKY_COOKIE in request.COOKIES
+        ):
+            return view(request, *args, **kwargs)
+        state.alias = random.choice(settings.READ_REPLICAS)
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            state.alias = None
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return current_replica()
+
+    def db_for_write(self, model, **hints):
+        state.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
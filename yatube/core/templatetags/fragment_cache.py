@@ -0,0 +1,49 @@
+from django import template
+from django.core.cache.utils import make_template_fragment_key
+from django.templatetags.cache import CacheNode
+
+from core.cache import get_or_compute
+
+register = template.Library()
+
+
+class FragmentCacheNode(CacheNode):
+    def render(self, context):
+        try:
+            timeout = self.expire_time_var.resolve(context)
+        except template.VariableDoesNotExist:
+            raise template.TemplateSyntaxError(
+                f'"fragment_cache" tag got an unknown variable: '
+                f'{self.expire_time_var.var!r}'
+            )
+        if timeout is not None:
+            timeout = int(timeout)
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        key = make_template_fragment_key(self.fragment_name, vary_on)
+        return get_or_compute(
+            key, lambda: self.nodelist.render(context), timeout
+        )
+
+
+@register.tag('fragment_cache')
+def do_fragment_cache(parser, token):
+    """
+    То же, что {% cache %}, но с досрочным пересчётом и блокировкой:
+    после истечения срока фрагмент перерисовывает один процесс.
+
+        {% fragment_cache 600 name var1 var2 %}...{% endfragment_cache %}
+    """
+    nodelist = parser.parse(('endfragment_cache',))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    if len(tokens) < 3:
+        raise template.TemplateSyntaxError(
+            f"'{tokens[0]}' tag requires at least 2 arguments."
+        )
+    return FragmentCacheNode(
+        nodelist,
+        parser.compile_filter(tokens[1]),
+        tokens[2],
+        [parser.compile_filter(token) for token in tokens[3:]],
+        None,
+    )
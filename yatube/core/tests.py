@@ -0,0 +1,436 @@
+import os
+import re
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import OperationalError, connection
+from django.template import Context, Template
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from core.cache import get_or_compute, lock_key, store
+from core.db import apply_pragmas, call_with_retries, serialized_write
+from core import profiling
+from core.metrics import REGISTRY
+from core.middleware import ProfilerMiddleware
+from core.routers import STICKY_COOKIE, ReplicaRouter, replica_reads
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+HASHED_NAME = 'posts/ab/' + 'ab' * 32 + '.jpg'
+
+
+class GetOrComputeTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        return f'value_{self.calls}'
+
+    def test_value_is_computed_once(self):
+        """Свежее значение берётся из кэша без пересчёта."""
+        self.assertEqual(get_or_compute('key', self.compute, 60), 'value_1')
+        self.assertEqual(get_or_compute('key', self.compute, 60), 'value_1')
+        self.assertEqual(self.calls, 1)
+
+    def test_early_recompute_near_expiry(self):
+        """Значение у самого срока пересчитывается заранее."""
+        store('key', 'old', delta=1, timeout=60)
+        expires_at = cache.get('key')[2]
+        with mock.patch('core.cache.random.random', return_value=0.5), \
+                mock.patch('core.cache.time.time',
+                           return_value=expires_at - 0.5):
+            value = get_or_compute('key', self.compute, 60)
+        self.assertEqual(value, 'value_1')
+
+    def test_locked_key_serves_stale_value(self):
+        """Пока другой процесс пересчитывает, отдаётся старое значение."""
+        cache.set('key', ('old', 0, time.time() - 1), 60)
+        cache.add(lock_key('key'), 1)
+        self.assertEqual(get_or_compute('key', self.compute, 60), 'old')
+        self.assertEqual(self.calls, 0)
+
+    def test_expired_lock_of_other_process_is_kept(self):
+        """Долгий пересчёт не снимает блокировку, взятую после него."""
+        def slow_compute():
+            cache.set(lock_key('key'), 'other', 60)
+            return 'value'
+
+        get_or_compute('key', slow_compute, 60)
+        self.assertEqual(cache.get(lock_key('key')), 'other')
+        get_or_compute('fresh', self.compute, 60)
+        self.assertIsNone(cache.get(lock_key('fresh')))
+
+    def test_fragment_cache_tag(self):
+        """Тег fragment_cache кэширует фрагмент шаблона."""
+        template = Template(
+            '{% load fragment_cache %}'
+            '{% fragment_cache 60 fragment page %}{{ name }}'
+            '{% endfragment_cache %}'
+        )
+        self.assertEqual(
+            template.render(Context({'page': 1, 'name': 'first'})), 'first'
+        )
+        self.assertEqual(
+            template.render(Context({'page': 1, 'name': 'second'})), 'first'
+        )
+        self.assertEqual(
+            template.render(Context({'page': 2, 'name': 'second'})), 'second'
+        )
+
+
+class DatabaseTuningTest(TestCase):
+    @override_settings(SQLITE_PRAGMAS={'cache_size': -4096})
+    def test_pragmas_applied(self):
+        """Прагмы профиля выполняются для соединения."""
+        apply_pragmas(None, connection)
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA cache_size')
+            self.assertEqual(cursor.fetchone()[0], -4096)
+
+    @mock.patch('core.db.time.sleep')
+    def test_locked_write_is_retried(self, sleep):
+        """Запись, упавшая на блокировке базы, повторяется."""
+        func = mock.Mock(side_effect=[
+            OperationalError('database is locked'), 'ok'
+        ])
+        self.assertEqual(call_with_retries(func), 'ok')
+        self.assertEqual(func.call_count, 2)
+        sleep.assert_called_once()
+
+    @mock.patch('core.db.time.sleep')
+    def test_other_errors_are_not_retried(self, sleep):
+        """Прочие ошибки базы и исчерпанные повторы не скрываются."""
+        func = mock.Mock(side_effect=OperationalError('no such table'))
+        with self.assertRaises(OperationalError):
+            call_with_retries(func)
+        self.assertEqual(func.call_count, 1)
+        func = mock.Mock(side_effect=OperationalError('database is locked'))
+        with self.assertRaises(OperationalError):
+            call_with_retries(func)
+        self.assertEqual(sleep.call_count, func.call_count - 1)
+
+    @mock.patch('core.db.connection')
+    @mock.patch('core.db.transaction')
+    def test_write_runs_in_transaction(self, transaction, db_connection):
+        """Вне транзакции запись выполняется внутри atomic."""
+        db_connection.in_atomic_block = False
+        self.assertEqual(
+            serialized_write(lambda value: value, 'saved'), 'saved'
+        )
+        transaction.atomic.assert_called_once_with()
+
+
+@override_settings(READ_REPLICAS=['replica_1', 'replica_2'])
+class ReplicaRoutingTest(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.router = ReplicaRouter()
+        self.view = replica_reads(
+            lambda request: self.router.db_for_read(None)
+        )
+
+    def test_reads_go_to_replica(self):
+        """Чтения в обёрнутом view идут в одну из реплик."""
+        self.assertIn(
+            self.view(self.factory.get('/')), ('replica_1', 'replica_2')
+        )
+        self.assertIsNone(self.router.db_for_read(None))
+        self.assertEqual(self.router.db_for_write(None), 'default')
+
+    def test_sticky_after_write(self):
+        """После записи пользователь читает из default."""
+        request = self.factory.get('/')
+        request.COOKIES[STICKY_COOKIE] = '1'
+        self.assertIsNone(self.view(request))
+        self.assertIsNone(self.view(self.factory.post('/')))
+
+    def test_write_sets_sticky_cookie(self):
+        """Cookie ставит запрос, который писал в базу, любым методом."""
+        author = User.objects.create_user(username='sticky_author')
+        client = Client()
+        client.force_login(User.objects.create_user(username='sticky'))
+        self.assertNotIn(STICKY_COOKIE, client.get('/auth/login/').cookies)
+        self.assertNotIn(STICKY_COOKIE, client.post('/auth/login/').cookies)
+        response = client.get(
+            reverse('posts:profile_follow', args=[author.username])
+        )
+        self.assertEqual(
+            response.cookies[STICKY_COOKIE]['max-age'],
+            settings.REPLICA_STICKY_SECONDS
+        )
+
+    @override_settings(READ_REPLICAS=[])
+    def test_without_replicas(self):
+        """Без реплик всё читается из default."""
+        self.assertIsNone(self.view(self.factory.get('/')))
+
+    def test_migrations_only_on_default(self):
+        """Миграции применяются только к default."""
+        self.assertTrue(self.router.allow_migrate('default', 'posts'))
+        self.assertFalse(self.router.allow_migrate('replica_1', 'posts'))
+
+
+class MetricsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        REGISTRY.clear()
+
+    def timing(self, response):
+        return dict(
+            part.split(';', 1)
+            for part in response['Server-Timing'].split(', ')
+        )
+
+    def cache_hits(self, timing):
+        return int(re.search(r'hit=(\d+)', timing['cache']).group(1))
+
+    def test_server_timing(self):
+        """Ответ несёт время, запросы к базе, шаблоны и кэш."""
+        cold = self.timing(Client().get('/'))
+        self.assertIn('queries', cold['db'])
+        self.assertNotEqual(cold['tpl'], 'dur=0.0')
+        self.assertIn('miss=', cold['cache'])
+        warm = self.timing(Client().get('/'))
+        self.assertGreater(self.cache_hits(warm), self.cache_hits(cold))
+
+    def test_prometheus_endpoint(self):
+        """Метрики копятся по имени view и отдаются в формате Prometheus."""
+        Client().get('/')
+        Client().get('/')
+        body = Client().get('/metrics').content.decode()
+        self.assertIn(
+            'yatube_request_duration_seconds_count{view="posts:index"} 2',
+            body
+        )
+        self.assertIn(
+            'yatube_request_duration_seconds_bucket'
+            '{view="posts:index",le="+Inf"} 2',
+            body
+        )
+        self.assertIn('yatube_db_queries_total{view="posts:index"}', body)
+
+    def test_endpoint_is_local(self):
+        """С чужого адреса и через прокси /metrics недоступен."""
+        response = Client().get('/metrics', REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, 404)
+        response = Client().get(
+            '/metrics', HTTP_X_FORWARDED_FOR='203.0.113.7'
+        )
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_endpoint_with_token(self):
+        """С токеном /metrics отдаётся только по верному Bearer."""
+        self.assertEqual(Client().get('/metrics').status_code, 404)
+        response = Client().get(
+            '/metrics', HTTP_AUTHORIZATION='Bearer wrong'
+        )
+        self.assertEqual(response.status_code, 404)
+        response = Client().get(
+            '/metrics',
+            REMOTE_ADDR='10.0.0.1',
+            HTTP_AUTHORIZATION='Bearer secret'
+        )
+        self.assertEqual(response.status_code, 200)
+
+
+def slow_view(request):
+    time.sleep(0.05)
+    return HttpResponse()
+
+
+@override_settings(
+    PROFILER_ENABLED=True,
+    PROFILER_THRESHOLD=0.02,
+    PROFILER_TOKEN='secret',
+    PROFILER_INTERVAL=0.002,
+    PROFILER_MAX_DUMPS=1,
+)
+class ProfilerTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        settings_override = override_settings(PROFILER_DIR=self.directory)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        profiling.DUMPS.times.clear()
+        self.factory = RequestFactory()
+
+    def dumps(self):
+        return sorted(os.listdir(self.directory))
+
+    def test_disabled_by_default(self):
+        """Без PROFILER_ENABLED middleware отключается."""
+        with override_settings(PROFILER_ENABLED=False):
+            with self.assertRaises(MiddlewareNotUsed):
+                ProfilerMiddleware(slow_view)
+
+    def test_slow_request_dumps_stacks(self):
+        """Медленный запрос сохраняет свёрнутые стеки."""
+        with self.assertLogs('core.profiling', 'WARNING'):
+            ProfilerMiddleware(slow_view)(self.factory.get('/'))
+        dumps = self.dumps()
+        self.assertEqual(len(dumps), 1)
+        self.assertRegex(dumps[0], r'-unresolved-\d+ms\.folded$')
+        with open(os.path.join(self.directory, dumps[0])) as file:
+            samples = dict(
+                line.rsplit(' ', 1) for line in file.read().splitlines()
+            )
+        self.assertTrue(any(
+            'slow_view (core/tests.py:' in stack.split(';')[-1]
+            for stack in samples
+        ))
+
+    def test_fast_request_is_not_dumped(self):
+        """Быстрый запрос профиль не оставляет."""
+        middleware = ProfilerMiddleware(lambda request: HttpResponse())
+        response = middleware(self.factory.get('/'))
+        self.assertEqual(self.dumps(), [])
+        self.assertNotIn('X-Profile', response)
+
+    def test_dumps_are_rate_limited(self):
+        """За период пишется не больше PROFILER_MAX_DUMPS профилей."""
+        middleware = ProfilerMiddleware(slow_view)
+        with self.assertLogs('core.profiling', 'WARNING') as logs:
+            middleware(self.factory.get('/'))
+            middleware(self.factory.get('/'))
+        self.assertEqual(len(logs.records), 1)
+        self.assertEqual(len(self.dumps()), 1)
+
+    def test_header_forces_profile(self):
+        """Заголовок с токеном даёт профиль даже быстрого запроса."""
+        middleware = ProfilerMiddleware(lambda request: HttpResponse())
+        middleware(self.factory.get('/', HTTP_X_PROFILE='wrong'))
+        self.assertEqual(self.dumps(), [])
+        for _ in range(2):
+            with self.assertLogs('core.profiling', 'WARNING'):
+                response = middleware(
+                    self.factory.get('/', HTTP_X_PROFILE='secret')
+                )
+            self.assertIn(response['X-Profile'], self.dumps())
+        self.assertEqual(len(self.dumps()), 2)
+
+    @override_settings(PROFILER_MAX_ACTIVE=1)
+    def test_active_requests_are_limited(self):
+        """Сверх PROFILER_MAX_ACTIVE запросы не сэмплируются."""
+        self.assertIsNotNone(profiling.SAMPLER.add(1))
+        try:
+            self.assertIsNone(profiling.SAMPLER.add(2))
+            self.assertIsNotNone(profiling.SAMPLER.add(3, force=True))
+        finally:
+            profiling.SAMPLER.remove(1)
+            profiling.SAMPLER.remove(3)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class MediaServingTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.content = bytes(range(256)) * 40
+        for name in ('posts/photo.jpg', HASHED_NAME):
+            path = os.path.join(TEMP_MEDIA_ROOT, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as file:
+                file.write(cls.content)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def get(self, name='posts/photo.jpg', **headers):
+        return Client().get(settings.MEDIA_URL + name, **headers)
+
+    def test_full_response(self):
+        """Файл отдаётся целиком с заголовками для кэширования."""
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(int(response['Content-Length']), len(self.content))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=3600')
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+
+    def test_hashed_name_is_immutable(self):
+        """Файл с хэшем содержимого в имени кэшируется навсегда."""
+        response = self.get(HASHED_NAME)
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(response['ETag'], '"' + 'ab' * 32 + '"')
+
+    def test_conditional_get(self):
+        """Совпавший ETag или дата изменения дают 304 без тела."""
+        response = self.get()
+        for headers in (
+            {'HTTP_IF_NONE_MATCH': response['ETag']},
+            {'HTTP_IF_MODIFIED_SINCE': response['Last-Modified']},
+        ):
+            with self.subTest(headers=headers):
+                not_modified = self.get(**headers)
+                self.assertEqual(not_modified.status_code, 304)
+                self.assertEqual(not_modified.content, b'')
+                self.assertEqual(not_modified['ETag'], response['ETag'])
+
+    def test_byte_ranges(self):
+        """Range отдаёт запрошенную часть файла."""
+        size = len(self.content)
+        cases = (
+            ('bytes=0-99', 0, 99),
+            ('bytes=100-', 100, size - 1),
+            ('bytes=-50', size - 50, size - 1),
+            (f'bytes=10-{size * 2}', 10, size - 1),
+        )
+        for header, start, end in cases:
+            with self.subTest(header=header):
+                response = self.get(HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(
+                    b''.join(response.streaming_content),
+                    self.content[start:end + 1]
+                )
+                self.assertEqual(
+                    response['Content-Range'], f'bytes {start}-{end}/{size}'
+                )
+                self.assertEqual(
+                    int(response['Content-Length']), end - start + 1
+                )
+
+    def test_unsatisfiable_range(self):
+        """Диапазон за концом файла даёт 416."""
+        response = self.get(HTTP_RANGE=f'bytes={len(self.content)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(
+            response['Content-Range'], f'bytes */{len(self.content)}'
+        )
+
+    def test_if_range_mismatch_returns_full_file(self):
+        """Устаревший If-Range отменяет диапазон."""
+        response = self.get(
+            HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"outdated"'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+
+    def test_missing_and_unsafe_paths(self):
+        """Несуществующие файлы и выход за MEDIA_ROOT дают 404."""
+        for name in ('posts/missing.jpg', 'posts', '../settings.py'):
+            with self.subTest(name=name):
+                self.assertEqual(self.get(name).status_code, 404)
+
+    def test_only_safe_methods(self):
+        """Файлы отдаются только на GET и HEAD."""
+        response = Client().post(settings.MEDIA_URL + 'posts/photo.jpg')
+        self.assertEqual(response.status_code, 405)
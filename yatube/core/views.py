@@ -1,13 +1,52 @@
+from django.conf import settings
+from django.http import Http404, HttpResponse
 from django.shortcuts import render
+from django.utils.crypto import constant_time_compare
+
+from .metrics import REGISTRY
+
+FORWARDED_HEADERS = (
+    'HTTP_FORWARDED', 'HTTP_X_FORWARDED_FOR', 'HTTP_X_REAL_IP'
+)
+
 
 def page_not_found(request, exception):
     return render(request, 'core/404.html', {'path': request.path}, status=404)
 
+
 def permission_denied(request, reason=''):
     return render(request, 'core/403.html')
 
+
 def server_error(request):
     return render(request, 'core/500.html', status=500)
 
+
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+def metrics_allowed(request):
+    """
+    С METRICS_TOKEN нужен заголовок Authorization: Bearer <токен>.
+    Без него — адрес из METRICS_ALLOWED_IPS и никаких заголовков
+    прокси: за локальным обратным прокси REMOTE_ADDR всегда 127.0.0.1,
+    и по адресу уже не понять, откуда пришёл запрос.
+    """
+    if settings.METRICS_TOKEN:
+        return constant_time_compare(
+            request.META.get('HTTP_AUTHORIZATION', ''),
+            f'Bearer {settings.METRICS_TOKEN}'
+        )
+    return (
+        request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS
+        and not any(header in request.META for header in FORWARDED_HEADERS)
+    )
+
+
+def metrics(request):
+    if not metrics_allowed(request):
+        raise Http404
+    return HttpResponse(
+        REGISTRY.render(), content_type='text/plain; version=0.0.4'
+    )
@@ -0,0 +1,247 @@
+"""
+JSON API для чтения лент: /api/v1/...
+
+Ответы компактные: без пробелов в JSON и без HTML-обвязки. Ленты
+листаются курсором, как и HTML-страницы.
+
+ETag считается до сериализации из того, что определяет ответ:
+pk, pub_date и число комментариев постов страницы, версии карточек
+(меняются при правке поста, автора или группы, см. cards.py) и
+наличие соседних страниц. Это одна выборка страницы с LIMIT и одно
+обращение к кэшу. Если клиент прислал тот же ETag в If-None-Match,
+ответ — 304 без тела.
+"""
+import hashlib
+from functools import wraps
+
+from django.db.models import Count
+from django.http import Http404, HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.views.decorators.http import require_safe
+
+from core.routers import replica_reads
+
+from . import live
+from .cards import attach_card_versions
+from .models import Comment, Group, Post, User
+from .paginators import CursorPaginator, TimelinePaginator
+from .timeline import follow_feed
+from .views import POSTS_COUNT, comment_page, with_viewer_follows
+
+API_VERSION = 1
+JSON_PARAMS = {'separators': (',', ':'), 'ensure_ascii': False}
+
+
+def error(message, status):
+    return JsonResponse(
+        {'detail': message}, status=status, json_dumps_params=JSON_PARAMS
+    )
+
+
+def api_view(view):
+    """Только GET/HEAD с чтением из реплик, ошибки 404 — в JSON."""
+    @require_safe
+    @replica_reads
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except Http404:
+            return error('Не найдено.', 404)
+    return wrapper
+
+
+def make_etag(*parts):
+    digest = hashlib.sha1(repr((API_VERSION,) + parts).encode())
+    return f'"{digest.hexdigest()}"'
+
+
+def posts_state(posts):
+    return [
+        (post.pk, post.pub_date.isoformat(), post.comments_count,
+         post.card_version)
+        for post in attach_card_versions(posts)
+    ]
+
+
+def conditional_json(request, etag, build, private=False):
+    """304 при совпавшем ETag, иначе JSON из build()."""
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = JsonResponse(build(), json_dumps_params=JSON_PARAMS)
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache' if private else 'no-cache'
+    if private:
+        patch_vary_headers(response, ('Cookie',))
+    return response
+
+
+def serialize_post(post):
+    return {
+        'id': post.pk,
+        'text': post.text,
+        'pub_date': post.pub_date,
+        'author': post.author.username,
+        'group': post.group.slug if post.group_id else None,
+        'image': post.image.url if post.image else None,
+        'thumbnail': {
+            'url': post.thumbnail.url,
+            'width': post.thumbnail_width,
+            'height': post.thumbnail_height,
+        } if post.thumbnail else None,
+        'comments': post.comments_count,
+    }
+
+
+def serialize_comment(comment):
+    return {
+        'id': comment.pk,
+        'author': comment.author.username,
+        'text': comment.text,
+        'created': comment.created,
+    }
+
+
+def feed_response(request, queryset, extra=None, private=False,
+                  paginator_class=CursorPaginator):
+    page = paginator_class(queryset, POSTS_COUNT).get_cursor_page(
+        request.GET.get('cursor')
+    )
+    etag = make_etag(
+        request.get_full_path(),
+        extra,
+        posts_state(page),
+        page.has_next(),
+        page.has_previous(),
+    )
+    return conditional_json(
+        request,
+        etag,
+        lambda: {
+            **(extra or {}),
+            'results': [serialize_post(post) for post in page],
+            'next_cursor': page.next_cursor,
+            'previous_cursor': page.previous_cursor,
+        },
+        private,
+    )
+
+
+@api_view
+def index(request):
+    return feed_response(request, Post.objects.feed())
+
+
+@api_view
+def group_posts(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    extra = {
+        'group': {
+            'slug': group.slug,
+            'title': group.title,
+            'description': group.description,
+            'posts': group.posts_count,
+        },
+    }
+    return feed_response(
+        request, Post.objects.feed().filter(group=group), extra
+    )
+
+
+@api_view
+def profile(request, username):
+    author = get_object_or_404(
+        with_viewer_follows(
+            User.objects.select_related('stats'), request.user
+        ),
+        username=username
+    )
+    stats = getattr(author, 'stats', None)
+    extra = {
+        'author': {
+            'username': author.username,
+            'full_name': author.get_full_name(),
+            'posts': stats.posts_count if stats else 0,
+            'followers': stats.followers_count if stats else 0,
+            'following': author.viewer_follows,
+        },
+    }
+    return feed_response(
+        request,
+        Post.objects.feed().filter(author=author),
+        extra,
+        private=True,
+    )
+
+
+@api_view
+def follow_index(request):
+    if not request.user.is_authenticated:
+        return error('Нужна авторизация.', 401)
+    return feed_response(
+        request, follow_feed(request.user),
+        private=True, paginator_class=TimelinePaginator
+    )
+
+
+@api_view
+def post_detail(request, post_id):
+    post = get_object_or_404(Post.objects.feed(), pk=post_id)
+    comments = comment_page(request, post_id)
+    etag = make_etag(
+        request.get_full_path(),
+        posts_state([post]),
+        [comment.pk for comment in comments],
+        comments.has_next(),
+    )
+    return conditional_json(request, etag, lambda: {
+        'post': serialize_post(post),
+        'comments': [serialize_comment(comment) for comment in comments],
+        'next_cursor': comments.next_cursor,
+    })
+
+
+@api_view
+def updates(request):
+    """
+    Что появилось в ленте после since: число новых постов, карточки
+    самых свежих из них и число новых комментариев по постам ленты.
+
+    Если после since ничего не создано, ответ 204 без обращения к базе.
+    """
+    feed = request.GET.get('feed', 'index')
+    if feed == 'follow':
+        if not request.user.is_authenticated:
+            return error('Нужна авторизация.', 401)
+        posts = follow_feed(request.user)
+    else:
+        posts = Post.objects.feed()
+    current = live.latest()
+    since_post, since_comment = live.parse_since(
+        request.GET.get('since'), current
+    )
+    if since_post >= current[0] and since_comment >= current[1]:
+        return HttpResponse(status=204)
+
+    def build():
+        new_posts = posts.filter(pk__gt=since_post)
+        comments = Comment.objects.filter(
+            pk__gt=since_comment, post__in=posts.values('pk')
+        ).values_list('post').annotate(count=Count('pk')).order_by()
+        return {
+            'since': live.format_since(current),
+            'new_posts': new_posts.count(),
+            'cards': [
+                serialize_post(post)
+                for post in new_posts[:live.MAX_CARDS]
+            ],
+            'new_comments': dict(comments),
+        }
+
+    return conditional_json(
+        request,
+        make_etag(request.get_full_path(), current),
+        build,
+        private=feed == 'follow',
+    )
@@ -0,0 +1,79 @@
+"""
+Версии карточек постов для фрагментного кэша.
+
+Карточка кэшируется без TTL под ключом из версий поста, автора и
+группы. Версии лежат в кэше и меняются сигналами после коммита
+сохранения объектов, поэтому правка поста или имени автора даёт новый
+ключ, а старый фрагмент просто вытесняется кэшем.
+
+Карточка, отрисованная из реплики, может отставать от default даже
+под новой версией. Такие карточки хранятся под отдельным ключом и
+только REPLICA_STICKY_SECONDS секунд, как и страницы ленты в
+page_cache.py.
+"""
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core.routers import current_replica
+
+VERSION_KEY = 'card_version:{}:{}'
+
+
+def version_key(kind, pk):
+    return VERSION_KEY.format(kind, pk)
+
+
+def bump_version(kind, pk):
+    cache.set(version_key(kind, pk), uuid4().hex, None)
+
+
+def post_version_keys(post):
+    return (
+        version_key('post', post.pk),
+        version_key('user', post.author_id),
+        version_key('group', post.group_id),
+    )
+
+
+def card_versions(posts):
+    """Версии постов, авторов и групп posts: {ключ версии: версия}."""
+    keys = {key for post in posts for key in post_version_keys(post)}
+    versions = cache.get_many(keys)
+    missing = {key: uuid4().hex for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return versions
+
+
+def versions_changed(versions):
+    """Поменялась ли с тех пор хоть одна версия из card_versions."""
+    return cache.get_many(list(versions)) != versions
+
+
+def attach_card_versions(posts, versions=None):
+    """Проставляет постам card_version одним обращением к кэшу."""
+    posts = list(posts)
+    if versions is None:
+        versions = card_versions(posts)
+    source = 'replica-' if current_replica() else ''
+    for post in posts:
+        post.card_version = source + '-'.join(
+            versions[key] for key in post_version_keys(post)
+        )
+    return posts
+
+
+def card_version(post):
+    if not hasattr(post, 'card_version'):
+        attach_card_versions([post])
+    return post.card_version
+
+
+def card_ttl():
+    """Срок фрагмента карточки: без срока, если она не из реплики."""
+    if current_replica():
+        return settings.REPLICA_STICKY_SECONDS
+    return None
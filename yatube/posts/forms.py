@@ -1,12 +1,64 @@
+from functools import partial
+
 from django import forms
+from django.db import transaction
+from django.template.defaultfilters import filesizeformat
 
+from . import thumbnails, uploads
 from .models import Post, Comment
 
 
+class UploadedImageField(forms.ImageField):
+    """
+    Картинка, проверенная по размеру файла и заголовку
+    и уменьшенная до разумного размера.
+    """
+    default_error_messages = {
+        'file_too_large': 'Файл больше %(limit)s.',
+        'too_many_pixels': 'Картинка больше %(limit)s Мпикс.',
+    }
+
+    def to_python(self, data):
+        if getattr(data, 'size', 0) > uploads.MAX_UPLOAD_SIZE:
+            raise forms.ValidationError(
+                self.error_messages['file_too_large'],
+                code='file_too_large',
+                params={'limit': filesizeformat(uploads.MAX_UPLOAD_SIZE)},
+            )
+        upload = super().to_python(data)
+        if upload is None:
+            return None
+        width, height = upload.image.size
+        if width * height > uploads.MAX_PIXELS:
+            raise forms.ValidationError(
+                self.error_messages['too_many_pixels'],
+                code='too_many_pixels',
+                params={'limit': uploads.MAX_PIXELS // 10 ** 6},
+            )
+        return uploads.downscale(upload)
+
+
 class PostForm(forms.ModelForm):
     class Meta:
         model = Post
         fields = ('text', 'group', 'image')
+        field_classes = {'image': UploadedImageField}
+
+    def save(self, commit=True):
+        old_files = []
+        if 'image' in self.changed_data:
+            # Старая миниатюра больше не соответствует картинке. Поля
+            # очищаются сразу, а файлы удаляются после коммита: задача
+            # пересборки увидит уже пустые поля и их не найдёт.
+            old_files = thumbnails.variant_files(self.instance)
+            self.instance.thumbnail = ''
+            self.instance.thumbnail_width = None
+            self.instance.thumbnail_height = None
+            self.instance.image_variants = ''
+        post = super().save(commit)
+        if old_files:
+            transaction.on_commit(partial(thumbnails.delete_files, old_files))
+        return post
 
 
 class CommentForm(forms.ModelForm):
@@ -0,0 +1,63 @@
+"""
+Уведомления о новых постах и комментариях для открытой ленты.
+
+Страница ленты запоминает since — pk последнего поста и последнего
+комментария на момент показа — и периодически опрашивает
+/api/v1/updates/. Последние pk лежат в кэше под LATEST_KEY: сигналы
+удаляют ключ при создании поста или комментария, а короткий
+LATEST_TTL ограничивает устаревание, если удаление разминулось с
+пересчётом. Поэтому опрос, когда ничего не появилось, не обращается
+к базе, а повторный опрос с тем же состоянием получает 304 по ETag.
+since старше MAX_LAG записей подтягивается вперёд: числа в ответе
+тогда неполные, зато подсчёт всегда идёт по короткому диапазону pk,
+и клиент с since=0.0 не заставит считать всю таблицу.
+
+Под WSGI соединение SSE или long-poll держит поток всё время
+ожидания, так что тысяча открытых вкладок заняла бы тысячу потоков.
+Короткий опрос освобождает поток сразу после ответа.
+"""
+from django.core.cache import cache
+from django.db.models import Max
+
+from .models import Comment, Post
+
+LATEST_KEY = 'live:latest'
+LATEST_TTL = 5
+POLL_INTERVAL = 15
+MAX_CARDS = 10
+MAX_LAG = 1000
+
+
+def latest():
+    """(pk последнего поста, pk последнего комментария)."""
+    value = cache.get(LATEST_KEY)
+    if value is None:
+        value = (
+            Post.objects.aggregate(pk=Max('pk'))['pk'] or 0,
+            Comment.objects.aggregate(pk=Max('pk'))['pk'] or 0,
+        )
+        cache.set(LATEST_KEY, value, LATEST_TTL)
+    return value
+
+
+def reset_latest():
+    cache.delete(LATEST_KEY)
+
+
+def format_since(value):
+    return '{}.{}'.format(*value)
+
+
+def parse_since(token, current):
+    """
+    Разбирает since; испорченное значение заменяется на current,
+    а отстающее больше чем на MAX_LAG подтягивается к current.
+    """
+    try:
+        post_pk, comment_pk = (int(part) for part in token.split('.'))
+    except (AttributeError, ValueError):
+        return current
+    return (
+        max(post_pk, current[0] - MAX_LAG),
+        max(comment_pk, current[1] - MAX_LAG),
+    )
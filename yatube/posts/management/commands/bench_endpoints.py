@@ -0,0 +1,249 @@
+"""
+Бенчмарк страниц и форм на наборах данных разного размера.
+
+Для каждого размера создаётся отдельная тестовая база, заполняется
+командой seed_data, и каждый endpoint прогоняется через тестовый
+клиент. Время меряется отдельным проходом без отладочных обёрток;
+число запросов к базе и пик выделенной памяти (tracemalloc) — во
+втором проходе, который на время не влияет.
+
+Кэш на время прогона подменяется отдельным LocMemCache (BENCH_CACHES):
+бенчмарк очищает кэш между запросами и пишет в него страницы и версии
+из временной базы, а общий кэш воркеров этого видеть не должен.
+
+Результат сохраняется в JSON (--output). С --compare команда
+сравнивает прогон с сохранённым и завершается с ошибкой, если p50
+вырос больше чем на --tolerance или запросов к базе стало больше.
+"""
+import json
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+from io import StringIO
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import AuthorStats, Group, Post
+
+User = get_user_model()
+
+PROFILE_REQUESTS = 5
+BENCH_CACHES = {
+    'default': {
+        'BACKEND': 'core.backends.InstrumentedCache',
+        'LOCATION': 'bench_endpoints',
+        'OPTIONS': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+    }
+}
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+def request(client, method, url, data):
+    response = getattr(client, method)(url, data)
+    expected = 200 if method == 'get' else 302
+    if response.status_code != expected:
+        raise CommandError(f'{method.upper()} {url}: {response.status_code}')
+    return response
+
+
+def measure(client, method, url, data=None, requests=50, warm=False):
+    """Метрики одного endpoint: перцентили, запросы к базе, память."""
+    timings = []
+    for _ in range(requests):
+        if not warm:
+            cache.clear()
+        start = time.perf_counter()
+        request(client, method, url, data)
+        timings.append(time.perf_counter() - start)
+    queries = []
+    peaks = []
+    tracemalloc.start()
+    try:
+        for _ in range(PROFILE_REQUESTS):
+            if not warm:
+                cache.clear()
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            with CaptureQueriesContext(connection) as captured:
+                request(client, method, url, data)
+            peaks.append(tracemalloc.get_traced_memory()[1] - before)
+            queries.append(len(captured))
+    finally:
+        tracemalloc.stop()
+    return {
+        'requests': requests,
+        'p50_ms': round(statistics.median(timings) * 1000, 3),
+        'p95_ms': round(percentile(timings, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(timings, 0.99) * 1000, 3),
+        'queries': max(queries),
+        'peak_kb': round(max(peaks) / 1024, 1),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Список регрессий относительно baseline."""
+    previous = {
+        (run['posts'], name): metrics
+        for run in baseline['runs']
+        for name, metrics in run['endpoints'].items()
+    }
+    regressions = []
+    for run in results['runs']:
+        for name, metrics in run['endpoints'].items():
+            old = previous.get((run['posts'], name))
+            if old is None:
+                continue
+            if metrics['p50_ms'] > old['p50_ms'] * (1 + tolerance):
+                regressions.append(
+                    f'{name} ({run["posts"]} постов): p50 '
+                    f'{old["p50_ms"]} → {metrics["p50_ms"]} мс'
+                )
+            if metrics['queries'] > old['queries']:
+                regressions.append(
+                    f'{name} ({run["posts"]} постов): запросов '
+                    f'{old["queries"]} → {metrics["queries"]}'
+                )
+    return regressions
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, cwd=settings.BASE_DIR
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Меряет задержки, число запросов и память основных страниц и '
+        'форм на нескольких размерах данных и сохраняет JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs='+', default=[1000, 10000],
+            help='Размеры набора данных в постах.'
+        )
+        parser.add_argument('--requests', type=int, default=50)
+        parser.add_argument(
+            '--warm', action='store_true',
+            help='Не очищать кэш между запросами.'
+        )
+        parser.add_argument('--output', help='Файл для результатов JSON.')
+        parser.add_argument('--compare', help='JSON прошлого прогона.')
+        parser.add_argument('--tolerance', type=float, default=0.2)
+
+    def handle(self, *args, **options):
+        results = {
+            'created': timezone.now().isoformat(),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'db_profile': settings.DB_PROFILE,
+            'warm_cache': options['warm'],
+            'runs': [],
+        }
+        old_name = connection.settings_dict['NAME']
+        with override_settings(CACHES=BENCH_CACHES):
+            for size in options['sizes']:
+                connection.creation.create_test_db(
+                    verbosity=0, autoclobber=True, serialize=False
+                )
+                try:
+                    results['runs'].append(self.run(size, options))
+                finally:
+                    connection.creation.destroy_test_db(
+                        old_name, verbosity=0
+                    )
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(results, file, ensure_ascii=False, indent=2)
+            self.stdout.write(f'Результаты: {options["output"]}')
+        if options['compare']:
+            with open(options['compare']) as file:
+                regressions = compare(
+                    results, json.load(file), options['tolerance']
+                )
+            if regressions:
+                raise CommandError(
+                    'Регрессии:\n' + '\n'.join(regressions)
+                )
+            self.stdout.write(self.style.SUCCESS('Регрессий нет.'))
+
+    def run(self, size, options):
+        call_command(
+            'seed_data',
+            users=max(size // 25, 20),
+            groups=20,
+            posts=size,
+            comments=size * 2,
+            follows=20,
+            seed=size,
+            skip_search=True,
+            stdout=StringIO(),
+        )
+        reader = User.objects.annotate(
+            follows=Count('follower')
+        ).order_by('-follows').first()
+        client = Client()
+        client.force_login(reader)
+        author = AuthorStats.objects.order_by('-posts_count').first().user
+        group = Group.objects.order_by('-posts_count').first()
+        post = Post.objects.order_by('-comments_count').first()
+        endpoints = (
+            ('index', 'get', reverse('posts:index'), None),
+            ('group_posts', 'get', reverse(
+                'posts:group_list', args=[group.slug]
+            ), None),
+            ('profile', 'get', reverse(
+                'posts:profile', args=[author.username]
+            ), None),
+            ('post_detail', 'get', reverse(
+                'posts:post_detail', args=[post.pk]
+            ), None),
+            ('follow_index', 'get', reverse('posts:follow_index'), None),
+            ('post_create', 'post', reverse('posts:post_create'), {
+                'text': 'Пост из бенчмарка', 'group': group.pk
+            }),
+            ('add_comment', 'post', reverse(
+                'posts:add_comment', args=[post.pk]
+            ), {'text': 'Комментарий из бенчмарка'}),
+        )
+        self.stdout.write(self.style.MIGRATE_HEADING(f'{size} постов'))
+        run = {'posts': size, 'endpoints': {}}
+        for name, method, url, data in endpoints:
+            metrics = measure(
+                client, method, url, data,
+                options['requests'], options['warm']
+            )
+            run['endpoints'][name] = metrics
+            self.stdout.write(
+                f'  {name:<13} p50 {metrics["p50_ms"]:8.2f}  '
+                f'p95 {metrics["p95_ms"]:8.2f}  '
+                f'p99 {metrics["p99_ms"]:8.2f} мс  '
+                f'{metrics["queries"]:3} запр.  '
+                f'{metrics["peak_kb"]:8.1f} КБ'
+            )
+        return run
@@ -0,0 +1,70 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from posts.models import Post
+from posts.storage import image_storage
+
+MEDIA_DIR = 'posts'
+GRACE = 60 * 60
+
+
+def walk(storage, path):
+    directories, files = storage.listdir(path)
+    for name in files:
+        yield f'{path}/{name}'
+    for directory in directories:
+        yield from walk(storage, f'{path}/{directory}')
+
+
+def count_references():
+    """Сколько постов ссылается на каждый файл в posts/."""
+    references = Counter()
+    for post in Post.objects.only(
+        'image', 'thumbnail', 'image_variants'
+    ).iterator():
+        names = {post.image.name, post.thumbnail.name}
+        names.update(variant['name'] for variant in post.variants)
+        references.update(name for name in names if name)
+    return references
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет файлы в posts/, на которые не ссылается ни один пост: '
+        'картинки удалённых постов, заменённые картинки и их варианты.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true')
+        parser.add_argument(
+            '--grace', type=int, default=GRACE,
+            help='Не трогать файлы моложе стольких секунд: их пост '
+                 'может быть ещё не сохранён.'
+        )
+
+    def handle(self, *args, **options):
+        if not image_storage.exists(MEDIA_DIR):
+            return
+        references = count_references()
+        cutoff = timezone.now() - timedelta(seconds=options['grace'])
+        removed = freed = 0
+        for name in walk(image_storage, MEDIA_DIR):
+            if references[name]:
+                continue
+            if image_storage.get_modified_time(name) > cutoff:
+                continue
+            freed += image_storage.size(name)
+            removed += 1
+            if options['verbosity'] > 1:
+                self.stdout.write(name)
+            if not options['dry_run']:
+                image_storage.delete(name)
+        shared = sum(1 for count in references.values() if count > 1)
+        action = 'Можно удалить' if options['dry_run'] else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} файлов: {removed}, {freed} байт. '
+            f'Файлов с несколькими ссылками: {shared}.'
+        ))
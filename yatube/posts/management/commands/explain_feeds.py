@@ -0,0 +1,152 @@
+import random
+import statistics
+import time
+from importlib import import_module
+
+from django.apps import apps as current_apps
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+
+from posts.paginators import rows_after
+from posts.timeline import follow_feed
+
+BEFORE_MIGRATION = ('posts', '0012_timeline')
+PAGE_SIZE = 10
+REPEAT = 20
+BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает планы и время запросов лент до и после '
+        'составных индексов на отдельной тестовой базе.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--follows', type=int, default=30)
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        try:
+            call_command('migrate', *BEFORE_MIGRATION, verbosity=0)
+            # Схема отстаёт от текущих моделей, поэтому до индексов
+            # данные пишутся и читаются историческими моделями.
+            old_apps = MigrationExecutor(
+                connection
+            ).loader.project_state(BEFORE_MIGRATION).apps
+            self.seed(old_apps, options)
+            posts = self.posts(old_apps)
+            self.report('До индексов', self.feed_queries(
+                old_apps, posts.filter(timeline_entries__user=self.reader)
+            ))
+            call_command('migrate', 'posts', verbosity=0)
+            reader = current_apps.get_model(
+                settings.AUTH_USER_MODEL
+            ).objects.get(pk=self.reader)
+            self.report('После индексов', self.feed_queries(
+                current_apps, follow_feed(reader)
+            ))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def seed(self, apps, options):
+        User = apps.get_model(settings.AUTH_USER_MODEL)
+        Group = apps.get_model('posts', 'Group')
+        Post = apps.get_model('posts', 'Post')
+        Follow = apps.get_model('posts', 'Follow')
+        # bulk_create не везде возвращает pk, поэтому они перечитываются.
+        User.objects.bulk_create(
+            (User(username=f'bench_user_{i}')
+             for i in range(options['users'])),
+            batch_size=BATCH_SIZE
+        )
+        Group.objects.bulk_create(
+            (Group(title=f'Группа {i}', slug=f'group-{i}', description='-')
+             for i in range(options['groups'])),
+            batch_size=BATCH_SIZE
+        )
+        users = list(User.objects.values_list('pk', flat=True))
+        groups = list(Group.objects.values_list('pk', flat=True))
+        Post.objects.bulk_create(
+            (Post(
+                text=f'Пост {i}',
+                author_id=random.choice(users),
+                group_id=random.choice(groups + [None]),
+            ) for i in range(options['posts'])),
+            batch_size=BATCH_SIZE
+        )
+        follows = []
+        for user in users:
+            authors = random.sample(
+                users, min(options['follows'], len(users))
+            )
+            follows.extend(
+                Follow(user_id=user, author_id=author)
+                for author in authors if author != user
+            )
+        Follow.objects.bulk_create(follows, batch_size=BATCH_SIZE)
+        timeline = import_module(
+            f'posts.migrations.{BEFORE_MIGRATION[1]}'
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(timeline.FILL_TIMELINES)
+        self.reader = users[0]
+        self.author = users[1]
+        self.group = groups[0]
+
+    def posts(self, apps):
+        return apps.get_model('posts', 'Post').objects.select_related(
+            'author', 'group'
+        ).order_by('-pub_date', '-pk')
+
+    def feed_queries(self, apps, follow):
+        posts = self.posts(apps)
+        middle = posts[posts.count() // 2]
+        return (
+            ('index', posts),
+            ('index, глубокая страница', rows_after(
+                posts, 'pub_date', middle.pub_date, middle.pk
+            )),
+            ('group_posts', posts.filter(group=self.group)),
+            ('profile', posts.filter(author=self.author)),
+            ('follow_index', follow),
+            ('подписка', apps.get_model('posts', 'Follow').objects.filter(
+                user=self.reader, author=self.author
+            )),
+        )
+
+    def report(self, title, queries):
+        self.stdout.write(self.style.MIGRATE_HEADING(title))
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+        for name, queryset in queries:
+            sql, params = queryset[:PAGE_SIZE + 1].query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute(self.explain_prefix() + sql, params)
+                plan = [str(row[-1]) for row in cursor.fetchall()]
+                timings = []
+                for _ in range(REPEAT):
+                    start = time.perf_counter()
+                    cursor.execute(sql, params)
+                    cursor.fetchall()
+                    timings.append((time.perf_counter() - start) * 1000)
+            self.stdout.write(
+                f'{name}: {statistics.median(timings):.3f} мс'
+            )
+            for line in plan:
+                self.stdout.write(f'    {line}')
+
+    def explain_prefix(self):
+        if connection.vendor == 'sqlite':
+            return 'EXPLAIN QUERY PLAN '
+        return 'EXPLAIN '
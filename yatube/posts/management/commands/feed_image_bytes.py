@@ -0,0 +1,71 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.thumbnails import FORMATS, THUMBNAIL_WIDTH
+
+PAGE_SIZE = 10
+
+
+def pick_variant(variants, width):
+    """Вариант, который браузер выберет из srcset для заданной ширины."""
+    for _, mime, _, _ in FORMATS:
+        candidates = sorted(
+            (variant for variant in variants if variant['type'] == mime),
+            key=lambda variant: variant['width']
+        )
+        if candidates:
+            return next(
+                (variant for variant in candidates
+                 if variant['width'] >= width),
+                candidates[-1]
+            )
+    return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Считает, сколько байт картинок скачивает страница ленты: '
+        'оригиналы, одна JPEG-миниатюра и адаптивные варианты.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=PAGE_SIZE)
+        parser.add_argument(
+            '--width', type=int, action='append', dest='widths',
+            help='Ширина области показа в пикселях, можно несколько раз.'
+        )
+
+    def handle(self, *args, **options):
+        widths = options['widths'] or [480, 960, 1440]
+        posts = list(
+            Post.objects.exclude(image_variants='')[:options['posts']]
+        )
+        if not posts:
+            self.stdout.write('Нет постов с готовыми вариантами картинок.')
+            return
+        originals = sum(
+            default_storage.size(post.image.name) for post in posts
+        )
+        thumbnails = sum(
+            pick_variant(
+                [v for v in post.variants if v['type'] == 'image/jpeg'],
+                THUMBNAIL_WIDTH
+            )['size']
+            for post in posts
+        )
+        self.stdout.write(f'Постов на странице: {len(posts)}')
+        self.stdout.write(f'Оригиналы: {originals} байт')
+        self.stdout.write(
+            f'JPEG {THUMBNAIL_WIDTH}px: {thumbnails} байт '
+            f'({thumbnails / originals:.0%} от оригиналов)'
+        )
+        for width in widths:
+            picked = [pick_variant(post.variants, width) for post in posts]
+            total = sum(variant['size'] for variant in picked)
+            formats = sorted({variant['type'] for variant in picked})
+            self.stdout.write(
+                f'<picture> при ширине {width}px: {total} байт '
+                f'({total / originals:.0%} от оригиналов, '
+                f'{", ".join(formats)})'
+            )
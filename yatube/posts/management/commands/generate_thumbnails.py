@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.thumbnails import make_thumbnail
+
+
+class Command(BaseCommand):
+    help = 'Строит миниатюры для постов с картинкой, у которых их нет.'
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').filter(
+            image_variants=''
+        ).values_list('pk', flat=True)
+        total = 0
+        for post_id in posts.iterator():
+            make_thumbnail(post_id)
+            total += 1
+        self.stdout.write(self.style.SUCCESS(f'Миниатюр построено: {total}'))
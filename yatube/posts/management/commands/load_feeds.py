@@ -0,0 +1,105 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+
+from posts.models import Post
+
+User = get_user_model()
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагружает ленты через WSGI-обработчик Django в несколько '
+        'потоков и печатает запр/с, p50 и p99 для каждой страницы.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument(
+            '--concurrency', type=int, nargs='+', default=[1, 4, 8]
+        )
+        parser.add_argument(
+            '--username',
+            help='Читатель для ленты подписок; без него она пропускается.'
+        )
+        parser.add_argument(
+            '--no-cache',
+            action='store_true',
+            help='Очищать кэш перед каждым запросом.'
+        )
+
+    def handle(self, *args, **options):
+        post = Post.objects.select_related('author', 'group').filter(
+            group__isnull=False
+        ).order_by('-pub_date').first()
+        if post is None:
+            raise CommandError('Нужен хотя бы один пост с группой.')
+        reader = None
+        pages = [
+            ('index', reverse('posts:index')),
+            ('group_list', reverse('posts:group_list', args=[
+                post.group.slug
+            ])),
+            ('profile', reverse('posts:profile', args=[
+                post.author.username
+            ])),
+            ('post_detail', reverse('posts:post_detail', args=[post.pk])),
+        ]
+        if options['username']:
+            reader = User.objects.get(username=options['username'])
+            pages.append(('follow_index', reverse('posts:follow_index')))
+        for concurrency in options['concurrency']:
+            self.stdout.write(f'Потоков: {concurrency}')
+            for label, url in pages:
+                self.run(label, url, concurrency, reader, options)
+
+    def run(self, label, url, concurrency, reader, options):
+        per_worker = max(options['requests'] // concurrency, 1)
+
+        def worker(_):
+            client = Client()
+            if reader is not None:
+                client.force_login(reader)
+            timings = []
+            try:
+                for _ in range(per_worker):
+                    if options['no_cache']:
+                        cache.clear()
+                    start = time.perf_counter()
+                    response = client.get(url)
+                    timings.append(time.perf_counter() - start)
+                    if response.status_code != 200:
+                        raise CommandError(
+                            f'{url}: ответ {response.status_code}'
+                        )
+            finally:
+                connection.close()
+            return timings
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as executor:
+            timings = [
+                timing
+                for worker_timings in executor.map(
+                    worker, range(concurrency)
+                )
+                for timing in worker_timings
+            ]
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f'  {label:<12} {len(timings) / elapsed:8.0f} запр/с  '
+            f'p50 {statistics.median(timings) * 1000:7.1f} мс  '
+            f'p99 {percentile(timings, 0.99) * 1000:7.1f} мс'
+        )
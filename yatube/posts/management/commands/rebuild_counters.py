@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from posts.models import AuthorStats, Comment, Follow, Group, Post
+
+
+def count_subquery(queryset, field):
+    counts = queryset.filter(**{field: OuterRef('pk')}).order_by().values(
+        field
+    ).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики постов, комментариев и подписчиков.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            Group.objects.update(
+                posts_count=count_subquery(Post.objects.all(), 'group')
+            )
+            Post.objects.update(
+                comments_count=count_subquery(Comment.objects.all(), 'post')
+            )
+            AuthorStats.objects.all().delete()
+            stats = {}
+            for model, field in (
+                (Post, 'posts_count'),
+                (Follow, 'followers_count'),
+            ):
+                rows = model.objects.order_by().values('author').annotate(
+                    total=Count('pk')
+                )
+                for row in rows.iterator():
+                    author_stats = stats.setdefault(
+                        row['author'], AuthorStats(user_id=row['author'])
+                    )
+                    setattr(author_stats, field, row['total'])
+            AuthorStats.objects.bulk_create(stats.values(), batch_size=500)
+        self.stdout.write(self.style.SUCCESS('Счётчики пересчитаны.'))
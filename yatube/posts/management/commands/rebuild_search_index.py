@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import search
+from posts.models import Comment, Group, Post
+
+
+class Command(BaseCommand):
+    help = 'Заново строит поисковый индекс постов, комментариев и групп.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            search.rebuild(Post, Comment, Group)
+        self.stdout.write(self.style.SUCCESS('Поисковый индекс перестроен.'))
@@ -0,0 +1,239 @@
+"""
+Массовая загрузка тестовых данных для нагрузочных прогонов.
+
+Строки пишутся bulk_create пачками по --batch, генераторы не держат в
+памяти ничего, кроме текущей пачки, поэтому миллионы постов грузятся
+в ограниченной памяти. pk новых строк идут подряд, так что ссылки на
+пользователей и посты вычисляются из диапазона pk без списков
+объектов.
+
+Распределения близки к реальным: подписчики, число постов у автора и
+комментарии у поста подчиняются степенному закону (power_law_rank),
+а ранги перемешиваются, чтобы популярные авторы и горячие посты не
+были просто первыми pk.
+
+bulk_create не вызывает сигналы, поэтому в конце пересчитываются
+счётчики, ленты подписок и поисковый индекс.
+"""
+import math
+import random
+import time
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, reset_queries, transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from posts import live, page_cache, timeline
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+WORDS = (
+    'кот', 'собака', 'город', 'море', 'горы', 'закат', 'утро', 'дорога',
+    'поезд', 'книга', 'музыка', 'вечер', 'друзья', 'работа', 'отпуск',
+    'фото', 'лес', 'река', 'дождь', 'солнце', 'кофе', 'ужин', 'прогулка',
+    'новости', 'проект', 'код', 'спорт', 'танцы', 'концерт', 'выставка',
+)
+SPREAD_POSTS = """
+UPDATE posts_post
+SET pub_date = datetime(%s, '-' || CAST((%s - id) * %s AS INTEGER)
+                            || ' seconds')
+WHERE id > %s
+"""
+SPREAD_COMMENTS = """
+UPDATE posts_comment
+SET created = MIN(datetime(%s), datetime(
+    (SELECT pub_date FROM posts_post WHERE posts_post.id = post_id),
+    '+' || (ABS(RANDOM()) %% %s) || ' seconds'
+))
+WHERE id > %s
+"""
+
+
+def power_law_rank(count, alpha):
+    """Ранг от 0 до count - 1 с вероятностью ~ (ранг + 1) ** -alpha."""
+    share = random.random()
+    if alpha == 1:
+        value = count ** share
+    else:
+        value = (
+            (count ** (1 - alpha) - 1) * share + 1
+        ) ** (1 / (1 - alpha))
+    return min(int(value) - 1, count - 1)
+
+
+def scatter_step(count):
+    """Шаг, с которым rank * step % count перемешивает ранги."""
+    step = int(count * 0.618) | 1
+    while math.gcd(step, count) != 1:
+        step += 2
+    return step
+
+
+def last_pk(model):
+    return model.objects.aggregate(pk=Max('pk'))['pk'] or 0
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу большим объёмом пользователей, групп, постов, '
+        'комментариев и подписок с реалистичным перекосом.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--groups', type=int, default=100)
+        parser.add_argument('--posts', type=int, default=1000000)
+        parser.add_argument('--comments', type=int, default=2000000)
+        parser.add_argument(
+            '--follows', type=int, default=30,
+            help='Среднее число подписок пользователя.'
+        )
+        parser.add_argument(
+            '--alpha', type=float, default=1.2,
+            help='Показатель степенного закона популярности.'
+        )
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--batch', type=int, default=5000)
+        parser.add_argument('--prefix', default='seed')
+        parser.add_argument('--seed', type=int)
+        parser.add_argument('--skip-search', action='store_true')
+
+    def handle(self, *args, **options):
+        if options['users'] < 2 or options['posts'] < 1:
+            raise CommandError('Нужно хотя бы 2 пользователя и 1 пост.')
+        if User.objects.filter(
+            username__startswith=f'{options["prefix"]}_'
+        ).exists():
+            raise CommandError(
+                f'Данные с префиксом {options["prefix"]} уже есть, '
+                f'задайте другой --prefix.'
+            )
+        random.seed(options['seed'])
+        self.options = options
+        self.alpha = options['alpha']
+        self.now = timezone.now().strftime('%Y-%m-%d %H:%M:%S')
+        self.started = time.perf_counter()
+
+        users = self.insert(User, self.users())
+        groups = self.insert(Group, self.groups())
+        self.insert(Follow, self.follows(users))
+        first_post = last_pk(Post)
+        posts = self.insert(Post, self.posts(users, groups))
+        first_comment = last_pk(Comment)
+        self.insert(Comment, self.comments(users, posts))
+
+        with connection.cursor() as cursor:
+            cursor.execute(SPREAD_POSTS, [
+                self.now,
+                posts.stop - 1,
+                options['days'] * 24 * 60 * 60 / len(posts),
+                first_post,
+            ])
+            cursor.execute(SPREAD_COMMENTS, [
+                self.now, 7 * 24 * 60 * 60, first_comment
+            ])
+        self.progress('Даты разнесены')
+        call_command('rebuild_counters', stdout=self.stdout)
+        with transaction.atomic():
+            timeline.rebuild()
+        self.progress('Ленты подписок заполнены')
+        if not options['skip_search']:
+            call_command('rebuild_search_index', stdout=self.stdout)
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+        page_cache.bump_generation()
+        live.reset_latest()
+        self.stdout.write(self.style.SUCCESS('Готово.'))
+
+    def progress(self, message):
+        elapsed = time.perf_counter() - self.started
+        self.stdout.write(f'{elapsed:8.1f} с  {message}')
+
+    def insert(self, model, rows):
+        """
+        Пишет строки пачками и возвращает диапазон pk новых строк.
+
+        Диапазон берётся по вставленным строкам: в SQLite pk идут с
+        AUTOINCREMENT, и после удаления последних строк новые
+        продолжают sqlite_sequence, а не max(pk) + 1.
+        """
+        previous = last_pk(model)
+        rows = iter(rows)
+        done = 0
+        while True:
+            batch = list(islice(rows, self.options['batch']))
+            if not batch:
+                break
+            with transaction.atomic():
+                model.objects.bulk_create(batch)
+            reset_queries()
+            done += len(batch)
+            self.progress(f'{model.__name__}: {done}')
+        bounds = model.objects.filter(pk__gt=previous).aggregate(
+            first=Min('pk'), last=Max('pk')
+        )
+        if bounds['first'] is None:
+            return range(0)
+        return range(bounds['first'], bounds['last'] + 1)
+
+    def pick(self, ids, step):
+        """pk по степенному закону с перемешанными рангами."""
+        rank = power_law_rank(len(ids), self.alpha)
+        return ids[rank * step % len(ids)]
+
+    def users(self):
+        prefix = self.options['prefix']
+        for number in range(self.options['users']):
+            yield User(
+                username=f'{prefix}_{number}',
+                first_name=random.choice(WORDS).title(),
+            )
+
+    def groups(self):
+        prefix = self.options['prefix']
+        for number in range(self.options['groups']):
+            yield Group(
+                title=f'{random.choice(WORDS).title()} {number}',
+                slug=f'{prefix}-{number}',
+                description=' '.join(random.choices(WORDS, k=10)),
+            )
+
+    def follows(self, users):
+        step = scatter_step(len(users))
+        for user_id in users:
+            count = random.randint(0, 2 * self.options['follows'])
+            authors = {self.pick(users, step) for _ in range(count)}
+            authors.discard(user_id)
+            for author_id in authors:
+                yield Follow(user_id=user_id, author_id=author_id)
+
+    def posts(self, users, groups):
+        step = scatter_step(len(users))
+        for _ in range(self.options['posts']):
+            group_id = None
+            if groups and random.random() < 0.7:
+                group_id = random.choice(groups)
+            yield Post(
+                text=' '.join(random.choices(
+                    WORDS, k=random.randint(5, 60)
+                )),
+                author_id=self.pick(users, step),
+                group_id=group_id,
+            )
+
+    def comments(self, users, posts):
+        step = scatter_step(len(posts))
+        for _ in range(self.options['comments']):
+            yield Comment(
+                text=' '.join(random.choices(
+                    WORDS, k=random.randint(2, 20)
+                )),
+                author_id=random.choice(users),
+                post_id=self.pick(posts, step),
+            )
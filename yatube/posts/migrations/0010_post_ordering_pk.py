@@ -0,0 +1,17 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:31
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_auto_20220304_1234'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='post',
+            options={'ordering': ('-pub_date', '-pk'), 'verbose_name': 'Пост', 'verbose_name_plural': 'Посты'},
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:34
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def fill_followers(apps, schema_editor):
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    Follow = apps.get_model('posts', 'Follow')
+    rows = Follow.objects.order_by().values('author').annotate(
+        total=Count('pk')
+    )
+    for row in rows:
+        AuthorStats.objects.update_or_create(
+            user_id=row['author'], defaults={'followers_count': row['total']}
+        )
+
+
+FILL_TIMELINES = """
+INSERT INTO posts_timelineentry (user_id, post_id)
+SELECT DISTINCT follow.user_id, post.id
+FROM posts_follow follow
+JOIN posts_post post ON post.author_id = follow.author_id
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0011_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='authorstats',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='posts.Post')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'post')},
+            },
+        ),
+        migrations.RunPython(fill_followers, migrations.RunPython.noop),
+        migrations.RunSQL(FILL_TIMELINES, migrations.RunSQL.noop),
+    ]
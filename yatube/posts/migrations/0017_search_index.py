@@ -0,0 +1,30 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:10
+
+from django.db import migrations
+
+
+def fill_search_index(apps, schema_editor):
+    from posts.search import rebuild
+
+    rebuild(
+        apps.get_model('posts', 'Post'),
+        apps.get_model('posts', 'Comment'),
+        apps.get_model('posts', 'Group'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_post_image_storage'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            "CREATE VIRTUAL TABLE posts_search USING fts5("
+            "kind UNINDEXED, object_id UNINDEXED, post_id UNINDEXED, body, "
+            "tokenize = 'unicode61 remove_diacritics 0')",
+            'DROP TABLE posts_search',
+        ),
+        migrations.RunPython(fill_search_index, migrations.RunPython.noop),
+    ]
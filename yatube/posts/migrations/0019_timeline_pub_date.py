@@ -0,0 +1,34 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:40
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+FILL_PUB_DATE = """
+UPDATE posts_timelineentry
+SET pub_date = (
+    SELECT pub_date FROM posts_post
+    WHERE posts_post.id = posts_timelineentry.post_id
+)
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_comment_cursor_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='timelineentry',
+            name='pub_date',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunSQL(FILL_PUB_DATE, migrations.RunSQL.noop),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['user', '-pub_date', '-post'], name='timeline_user_pub_date_idx'),
+        ),
+    ]
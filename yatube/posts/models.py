@@ -1,7 +1,12 @@
+import json
+
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.core.files.storage import default_storage
+from django.db import models, transaction
 from django.urls import reverse
 
+from .storage import image_storage
+
 User = get_user_model()
 
 
@@ -9,11 +14,39 @@ class Group(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(unique=True)
     description = models.TextField()
+    posts_count = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    FEED_FIELDS = (
+        'text',
+        'pub_date',
+        'image',
+        'thumbnail',
+        'thumbnail_width',
+        'thumbnail_height',
+        'image_variants',
+        'comments_count',
+        'author__username',
+        'author__first_name',
+        'author__last_name',
+        'group__title',
+        'group__slug',
+    )
+
+    def feed(self):
+        """
+        Посты для лент: автор и группа подгружаются одним JOIN,
+        из таблиц читаются только поля, нужные карточке поста.
+        """
+        return self.select_related('author', 'group').only(
+            *self.FEED_FIELDS
+        )
+
+
 class Post(models.Model):
     text = models.TextField(
         verbose_name='Текст поста',
@@ -38,17 +71,75 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
-        blank=True
+        blank=True,
+        storage=image_storage
     )
+    thumbnail = models.ImageField(
+        'Миниатюра',
+        upload_to='posts/thumbs/',
+        blank=True,
+        editable=False
+    )
+    thumbnail_width = models.PositiveIntegerField(null=True, editable=False)
+    thumbnail_height = models.PositiveIntegerField(null=True, editable=False)
+    image_variants = models.TextField(blank=True, editable=False)
+
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = PostQuerySet.as_manager()
 
     def __str__(self):
         return self.text[:15]
 
+    def save(self, *args, **kwargs):
+        # Счётчики обновляются сигналами внутри той же транзакции.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
     def get_absolute_url(self):
         return reverse('posts:post_detail', kwargs={'post_id': self.pk})
 
+    @property
+    def variants(self):
+        # Нечитаемый список вариантов не должен ломать ленту:
+        # карточка тогда покажет только миниатюру.
+        try:
+            return json.loads(self.image_variants or '[]')
+        except ValueError:
+            return []
+
+    @property
+    def image_sources(self):
+        """
+        Варианты картинки для <picture>: по одному <source> на формат,
+        форматы в порядке предпочтения, JPEG последним.
+        """
+        sources = {}
+        for variant in self.variants:
+            url = default_storage.url(variant['name'])
+            sources.setdefault(variant['type'], []).append(
+                f'{url} {variant["width"]}w'
+            )
+        return [
+            {'type': mime, 'srcset': ', '.join(srcset)}
+            for mime, srcset in sources.items()
+        ]
+
     class Meta:
-        ordering = ('-pub_date',)
+        ordering = ('-pub_date', '-pk')
+        indexes = (
+            models.Index(
+                fields=('-pub_date', '-id'), name='post_pub_date_idx'
+            ),
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                name='post_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=('group', '-pub_date', '-id'),
+                name='post_group_pub_date_idx'
+            ),
+        )
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
 
@@ -74,11 +165,21 @@ class Comment(models.Model):
         auto_now_add=True
     )
 
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
     def get_absolute_url(self):
         return reverse('posts:post_detail', kwargs={'post_id': self.pk})
 
     class Meta:
-        ordering = ('-created',)
+        ordering = ('-created', '-pk')
+        indexes = (
+            models.Index(
+                fields=('post', '-created', '-id'),
+                name='comment_post_created_idx'
+            ),
+        )
 
     
 class Follow(models.Model):
@@ -93,5 +194,56 @@ class Follow(models.Model):
         on_delete=models.CASCADE
     )
 
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
     def __str__(self):
         return f"Последователь: '{self.user}', автор: '{self.author}'"
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'author'), name='unique_follow'
+            ),
+        )
+
+
+class AuthorStats(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats'
+    )
+    posts_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"Постов у '{self.user}': {self.posts_count}"
+
+
+class TimelineEntry(models.Model):
+    """Пост в материализованной ленте подписок пользователя."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries'
+    )
+    # Копия Post.pub_date: лента читается по индексу без сортировки.
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('user', 'post')
+        indexes = (
+            models.Index(
+                fields=('user', '-pub_date', '-post'),
+                name='timeline_user_pub_date_idx'
+            ),
+        )
@@ -0,0 +1,100 @@
+"""
+Кэш главной страницы с адресной инвалидацией.
+
+Ключ фрагмента index_page содержит поколение ленты: новый или
+удалённый пост сдвигает первую страницу и страницы ?page=N, поэтому
+такие события меняют поколение. Страница по курсору «дальше» от
+поколения не зависит: новые посты идут выше неё. Курсор «назад»
+может упереться в начало ленты, а битый курсор отдаёт первую
+страницу, поэтому их ключи содержат поколение. Ключ строится из
+разобранного курсора, а не из присланной строки.
+
+Вместе с HTML страница хранит версии карточек своих постов, авторов
+и групп (posts/cards.py) на момент отрисовки. Правка объекта меняет
+его версию, и при чтении страница, где он показан, рисуется заново;
+остальные страницы остаются в кэше. Каждая страница хранит свои
+зависимости сама, поэтому общего реестра, который пришлось бы
+дописывать из разных запросов, нет.
+"""
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+
+from core.cache import get_or_compute
+from core.routers import current_replica
+
+from . import cards
+from .paginators import NEXT, decode_cursor
+
+INDEX_PAGE = 'index_page'
+INDEX_PAGE_TTL = 60 * 60 * 6
+GENERATION_KEY = 'index_page_generation'
+
+
+def generation():
+    value = cache.get(GENERATION_KEY)
+    if value is None:
+        cache.add(GENERATION_KEY, uuid4().hex, None)
+        value = cache.get(GENERATION_KEY)
+    return value
+
+
+def bump_generation():
+    cache.set(GENERATION_KEY, uuid4().hex, None)
+
+
+def index_page_version(request):
+    """
+    Часть ключа фрагмента index_page для текущего запроса.
+
+    Страница, прочитанная из реплики, может отставать от default,
+    поэтому кэшируется отдельно и недолго (см. index_page_ttl).
+    """
+    page = request.GET.get('page')
+    cursor = decode_cursor(request.GET.get('cursor') or '')
+    if page is not None:
+        version = f'{generation()}:page:{page}'
+    elif cursor is None:
+        version = f'{generation()}:'
+    else:
+        direction, value, pk = cursor
+        version = f'{direction}:{value.isoformat()}:{pk}'
+        if direction != NEXT:
+            version = f'{generation()}:{version}'
+    if current_replica():
+        return f'replica:{version}'
+    return version
+
+
+def index_page_ttl():
+    if current_replica():
+        return settings.REPLICA_STICKY_SECONDS
+    return INDEX_PAGE_TTL
+
+
+def fragment_key(version):
+    return make_template_fragment_key(INDEX_PAGE, [version])
+
+
+def cached_index_page(version, posts, render):
+    """
+    HTML страницы ленты из кэша или от render().
+
+    Версии карточек снимаются в той же функции, что рисует страницу,
+    поэтому любая перерисовка, в том числе досрочная, сохраняет их
+    заново вместе с HTML.
+    """
+    key = fragment_key(version)
+
+    def compute():
+        versions = cards.card_versions(posts)
+        cards.attach_card_versions(posts, versions)
+        return render(), versions
+
+    html, versions = get_or_compute(key, compute, index_page_ttl())
+    if cards.versions_changed(versions):
+        cache.delete(key)
+        html, versions = get_or_compute(key, compute, index_page_ttl())
+    return html
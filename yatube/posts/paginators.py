@@ -0,0 +1,184 @@
+import base64
+import binascii
+
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+def encode_cursor(direction, obj, field='pub_date', key='pk'):
+    """Упаковывает позицию (значение поля, id) в непрозрачный токен."""
+    value = getattr(obj, field).isoformat()
+    raw = f'{direction}|{value}|{getattr(obj, key)}'
+    token = base64.urlsafe_b64encode(raw.encode())
+    return token.decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Возвращает (direction, value, pk) или None для битого токена."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        direction, value, pk = raw.split('|')
+        value = parse_datetime(value)
+        pk = int(pk)
+    except (binascii.Error, UnicodeError, ValueError):
+        return None
+    if direction not in (NEXT, PREVIOUS) or value is None:
+        return None
+    return direction, value, pk
+
+
+def rows_after(queryset, field, value, pk, key='pk'):
+    """
+    Строки, идущие после позиции (value, pk) при сортировке по убыванию.
+
+    Условие field <= ? вынесено отдельно, чтобы СУБД могла
+    читать индекс по field диапазоном, а не перебирать OR.
+    """
+    return queryset.filter(**{f'{field}__lte': value}).filter(
+        Q(**{f'{field}__lt': value}) | Q(**{f'{key}__lt': pk})
+    )
+
+
+def rows_before(queryset, field, value, pk, key='pk'):
+    return queryset.filter(**{f'{field}__gte': value}).filter(
+        Q(**{f'{field}__gt': value}) | Q(**{f'{key}__gt': pk})
+    )
+
+
+class CursorPage(Page):
+    """
+    Страница ленты, выбранная по курсору без COUNT и OFFSET.
+
+    Посты читаются при первом обращении, поэтому страница, чей
+    HTML уже лежит в кэше, не обращается к базе.
+    """
+
+    is_cursor = True
+
+    def __init__(self, paginator, cursor=None):
+        self.paginator = paginator
+        self.number = 1
+        self.cursor = cursor
+
+    def __repr__(self):
+        return '<Cursor page>'
+
+    @cached_property
+    def _window(self):
+        return self.paginator.fetch(self.cursor)
+
+    @property
+    def object_list(self):
+        return self._window[0]
+
+    def has_next(self):
+        return self._window[1]
+
+    def has_previous(self):
+        return self._window[2]
+
+    @cached_property
+    def next_cursor(self):
+        if not self.has_next():
+            return None
+        return encode_cursor(
+            NEXT, self.object_list[-1],
+            self.paginator.field, self.paginator.key
+        )
+
+    @cached_property
+    def previous_cursor(self):
+        if not self.has_previous():
+            return None
+        return encode_cursor(
+            PREVIOUS, self.object_list[0],
+            self.paginator.field, self.paginator.key
+        )
+
+
+class CursorPaginator(Paginator):
+    """
+    Пагинатор по ключу (field, id) от новых строк к старым;
+    для постов это порядок Post.Meta.ordering.
+
+    Каждая страница читается одним запросом с LIMIT, поэтому глубокие
+    страницы стоят столько же, сколько первая.
+    """
+
+    field = 'pub_date'
+    key = 'pk'
+
+    def get_cursor_page(self, token=None):
+        return CursorPage(self, decode_cursor(token) if token else None)
+
+    def fetch(self, cursor):
+        """Возвращает (посты, has_next, has_previous) для курсора."""
+        if cursor is None:
+            return self._window_after(None)
+        direction, value, pk = cursor
+        if direction == NEXT:
+            return self._window_after(value, pk)
+        return self._window_before(value, pk)
+
+    def _window_after(self, value, pk=None):
+        queryset = self.object_list.order_by(
+            f'-{self.field}', f'-{self.key}'
+        )
+        if value is not None:
+            queryset = rows_after(queryset, self.field, value, pk, self.key)
+        posts = list(queryset[:self.per_page + 1])
+        return (
+            posts[:self.per_page],
+            len(posts) > self.per_page,
+            value is not None,
+        )
+
+    def _window_before(self, value, pk):
+        queryset = rows_before(
+            self.object_list.order_by(self.field, self.key),
+            self.field, value, pk, self.key
+        )
+        posts = list(queryset[:self.per_page + 1])
+        if not posts:
+            return self._window_after(None)
+        return (
+            posts[:self.per_page][::-1],
+            True,
+            len(posts) > self.per_page,
+        )
+
+
+class CommentPaginator(CursorPaginator):
+    """Комментарии поста от новых к старым, ключ (created, id)."""
+
+    field = 'created'
+
+
+class TimelinePaginator(CursorPaginator):
+    """
+    Лента подписок по ключу (timeline_date, timeline_post) из
+    timeline.follow_feed, то есть по индексу материализованной ленты.
+    """
+
+    field = 'timeline_date'
+    key = 'timeline_post'
+
+
+def paginate(request, queryset, per_page, paginator_class=CursorPaginator):
+    """
+    Возвращает страницу ленты.
+
+    Старые ссылки вида ?page=N обслуживает обычный Paginator,
+    все остальные запросы идут через курсор ?cursor=<токен>.
+    """
+    page_number = request.GET.get('page')
+    if page_number is not None:
+        return Paginator(queryset, per_page).get_page(page_number)
+    paginator = paginator_class(queryset, per_page)
+    return paginator.get_cursor_page(request.GET.get('cursor'))
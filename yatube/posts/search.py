@@ -0,0 +1,285 @@
+"""
+Полнотекстовый поиск по постам, комментариям и группам.
+
+Индекс — таблица SQLite FTS5 posts_search. Текст в неё пишется уже
+нормализованным: слова приведены к нижнему регистру, ё заменена на е,
+русские слова сокращены до основы стеммером Snowball. Запрос
+нормализуется так же, поэтому «котами» находит «кот» и «коты».
+
+Каждая строка индекса — один объект: пост, комментарий или группа.
+rowid вычисляется из вида и pk объекта, так что обновление индекса
+при сохранении и удалении — это удаление и вставка по rowid.
+
+Результат поиска — посты. Пост попадает в выдачу по своему тексту,
+по тексту комментария или по названию своей группы, а его оценка —
+лучшая из bm25 совпавших строк с весом WEIGHTS.
+"""
+import re
+
+from django.db import connection, models
+
+TABLE = 'posts_search'
+POST, COMMENT, GROUP = 0, 1, 2
+KINDS = 4
+WEIGHTS = {POST: 1.0, COMMENT: 0.5, GROUP: 0.3}
+WORD = re.compile(r'\w+')
+
+VOWELS = 'аеиоуыэюя'
+PERFECTIVE_GERUND = (
+    ('в', 'вши', 'вшись'),
+    ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'),
+)
+REFLEXIVE = ((), ('ся', 'сь'))
+ADJECTIVE = ((), (
+    'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем',
+    'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю',
+    'ая', 'яя', 'ою', 'ею',
+))
+PARTICIPLE = (
+    ('ем', 'нн', 'вш', 'ющ', 'щ'),
+    ('ивш', 'ывш', 'ующ'),
+)
+VERB = (
+    ('ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но',
+     'ет', 'ют', 'ны', 'ть', 'ешь', 'нно'),
+    ('ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей', 'уй',
+     'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят', 'ует', 'уют',
+     'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю'),
+)
+NOUN = ((), (
+    'а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии',
+    'и', 'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам',
+    'ом', 'о', 'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия',
+    'ья', 'я',
+))
+DERIVATIONAL = ('ость', 'ост')
+SUPERLATIVE = ('ейше', 'ейш')
+
+
+def cut_ending(word, endings):
+    """
+    Отрезает самое длинное окончание из endings = (после а/я, любые).
+
+    Окончания первой группы должны идти после «а» или «я», иначе
+    отрезать нечего. Возвращает None, если окончание не подошло.
+    """
+    after_a, anywhere = endings
+    ending = max(
+        (end for end in after_a + anywhere if word.endswith(end)),
+        key=len,
+        default=None
+    )
+    if ending is None:
+        return None
+    stem = word[:-len(ending)]
+    if ending in after_a and ending not in anywhere:
+        if not stem.endswith(('а', 'я')):
+            return None
+    return stem
+
+
+def regions(word):
+    """Начала областей RV и R2 по правилам Snowball."""
+    rv = r1 = r2 = len(word)
+    for i, char in enumerate(word):
+        if char in VOWELS:
+            rv = i + 1
+            break
+    for i in range(1, len(word)):
+        if word[i - 1] in VOWELS and word[i] not in VOWELS:
+            r1 = i + 1
+            break
+    for i in range(r1 + 1, len(word)):
+        if word[i - 1] in VOWELS and word[i] not in VOWELS:
+            r2 = i + 1
+            break
+    return rv, r2
+
+
+def remove_inflection(rv):
+    """
+    Шаг 1: окончание деепричастия, прилагательного или причастия,
+    глагола или существительного.
+    """
+    gerund = cut_ending(rv, PERFECTIVE_GERUND)
+    if gerund is not None:
+        return gerund
+    reflexive = cut_ending(rv, REFLEXIVE)
+    if reflexive is not None:
+        rv = reflexive
+    adjective = cut_ending(rv, ADJECTIVE)
+    if adjective is not None:
+        participle = cut_ending(adjective, PARTICIPLE)
+        return adjective if participle is None else participle
+    verb = cut_ending(rv, VERB)
+    if verb is not None:
+        return verb
+    noun = cut_ending(rv, NOUN)
+    return rv if noun is None else noun
+
+
+def remove_derivational(rv, r2):
+    """Шаг 3: словообразовательный суффикс, если он целиком в R2."""
+    for ending in DERIVATIONAL:
+        if rv.endswith(ending) and len(rv) - len(ending) >= r2:
+            return rv[:-len(ending)]
+    return rv
+
+
+def tidy_up(rv):
+    """Шаг 4: двойное «н», превосходная степень и мягкий знак."""
+    if rv.endswith('нн'):
+        return rv[:-1]
+    superlative = next(
+        (end for end in SUPERLATIVE if rv.endswith(end)), None
+    )
+    if superlative:
+        rv = rv[:-len(superlative)]
+        return rv[:-1] if rv.endswith('нн') else rv
+    if rv.endswith('ь'):
+        return rv[:-1]
+    return rv
+
+
+def stem(word):
+    """Основа русского слова по алгоритму Snowball."""
+    word = word.lower().replace('ё', 'е')
+    rv_start, r2_start = regions(word)
+    prefix, rv = word[:rv_start], word[rv_start:]
+    rv = remove_inflection(rv)
+    if rv.endswith('и'):
+        rv = rv[:-1]
+    rv = remove_derivational(rv, r2_start - rv_start)
+    return prefix + tidy_up(rv)
+
+
+def normalize(text):
+    """Текст в виде основ слов через пробел."""
+    return ' '.join(
+        stem(word) if re.search('[а-яё]', word) else word
+        for word in WORD.findall(text.lower())
+    )
+
+
+def match_expression(query):
+    """Запрос FTS5: все основы запроса, каждая в кавычках."""
+    return ' '.join(f'"{word}"' for word in normalize(query).split())
+
+
+def row_id(kind, pk):
+    return pk * KINDS + kind
+
+
+def index(kind, pk, post_id, text):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {TABLE} WHERE rowid = %s', [row_id(kind, pk)]
+        )
+        cursor.execute(
+            f'INSERT INTO {TABLE} (rowid, kind, object_id, post_id, body) '
+            f'VALUES (%s, %s, %s, %s, %s)',
+            [row_id(kind, pk), kind, pk, post_id, normalize(text)]
+        )
+
+
+def unindex(kind, pk):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {TABLE} WHERE rowid = %s', [row_id(kind, pk)]
+        )
+
+
+def index_post(post):
+    index(POST, post.pk, post.pk, post.text)
+
+
+def index_comment(comment):
+    index(COMMENT, comment.pk, comment.post_id, comment.text)
+
+
+def index_group(group):
+    index(GROUP, group.pk, None, group.title)
+
+
+def rebuild(post_model, comment_model, group_model):
+    """Заново строит индекс. Модели передаются, чтобы работать и в миграции."""
+    sources = (
+        (POST, post_model.objects.annotate(
+            post=models.F('pk')
+        ).values_list('pk', 'post', 'text')),
+        (COMMENT, comment_model.objects.values_list('pk', 'post', 'text')),
+        (GROUP, group_model.objects.annotate(
+            post=models.Value(None, models.IntegerField())
+        ).values_list('pk', 'post', 'title')),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+        for kind, rows in sources:
+            cursor.executemany(
+                f'INSERT INTO {TABLE} (rowid, kind, object_id, post_id, '
+                f'body) VALUES (%s, %s, %s, %s, %s)',
+                (
+                    (row_id(kind, pk), kind, pk, post_id, normalize(text))
+                    for pk, post_id, text in rows.iterator()
+                )
+            )
+
+
+RANKED_POSTS = f"""
+WITH hits AS (
+    SELECT kind, object_id, post_id, bm25({TABLE}) AS score
+    FROM {TABLE}
+    WHERE {TABLE} MATCH %s
+), scores AS (
+    SELECT post_id, score * CASE kind
+        WHEN {POST} THEN {WEIGHTS[POST]}
+        ELSE {WEIGHTS[COMMENT]}
+    END AS score
+    FROM hits
+    WHERE kind != {GROUP}
+    UNION ALL
+    SELECT post.id, hits.score * {WEIGHTS[GROUP]}
+    FROM hits
+    JOIN posts_post post ON post.group_id = hits.object_id
+    WHERE hits.kind = {GROUP}
+)
+"""
+
+
+class SearchResults:
+    """
+    Посты, найденные по запросу, в порядке релевантности.
+
+    Поддерживает count() и срезы, поэтому подходит для Paginator:
+    каждая страница — один запрос к индексу и один к постам.
+    """
+    def __init__(self, query, queryset):
+        self.expression = match_expression(query)
+        self.queryset = queryset
+
+    def count(self):
+        if not self.expression:
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                RANKED_POSTS + 'SELECT COUNT(DISTINCT post_id) FROM scores',
+                [self.expression]
+            )
+            return cursor.fetchone()[0]
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            raise TypeError('SearchResults supports only slicing.')
+        if not self.expression:
+            return []
+        start = index.start or 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                RANKED_POSTS
+                + 'SELECT post_id FROM scores GROUP BY post_id '
+                'ORDER BY MIN(score), post_id DESC LIMIT %s OFFSET %s',
+                [self.expression, index.stop - start, start]
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+        posts = self.queryset.in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
@@ -0,0 +1,178 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import cards, live, page_cache, search, timeline
+from .models import AuthorStats, Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+def change_author_stats(user_id, field, delta):
+    updated = AuthorStats.objects.filter(
+        user_id=user_id, **{f'{field}__gte': -delta}
+    ).update(**{field: F(field) + delta})
+    if not updated and delta > 0:
+        AuthorStats.objects.get_or_create(user_id=user_id)
+        AuthorStats.objects.filter(user_id=user_id).update(
+            **{field: F(field) + delta}
+        )
+
+
+def change_author_posts(user_id, delta):
+    change_author_stats(user_id, 'posts_count', delta)
+
+
+def change_group_posts(group_id, delta):
+    if group_id is None:
+        return
+    Group.objects.filter(
+        pk=group_id, posts_count__gte=-delta
+    ).update(posts_count=F('posts_count') + delta)
+
+
+def change_post_comments(post_id, delta):
+    Post.objects.filter(
+        pk=post_id, comments_count__gte=-delta
+    ).update(comments_count=F('comments_count') + delta)
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_owners(sender, instance, raw=False, **kwargs):
+    """Запоминает автора и группу до сохранения, чтобы перенести счётчики."""
+    instance._old_owners = None
+    if instance.pk and not raw:
+        instance._old_owners = Post.objects.filter(
+            pk=instance.pk
+        ).values_list('author_id', 'group_id').first()
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    old_owners = getattr(instance, '_old_owners', None)
+    if created or old_owners is None:
+        change_author_posts(instance.author_id, 1)
+        change_group_posts(instance.group_id, 1)
+        timeline.fan_out_post(instance)
+        return
+    old_author_id, old_group_id = old_owners
+    if old_author_id != instance.author_id:
+        change_author_posts(old_author_id, -1)
+        change_author_posts(instance.author_id, 1)
+    if old_group_id != instance.group_id:
+        change_group_posts(old_group_id, -1)
+        change_group_posts(instance.group_id, 1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    change_author_posts(instance.author_id, -1)
+    change_group_posts(instance.group_id, -1)
+
+
+@receiver(post_save, sender=Comment)
+def count_saved_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        change_post_comments(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    change_post_comments(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_author(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        change_author_stats(instance.author_id, 'followers_count', 1)
+        timeline.add_author(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def unfollow_author(sender, instance, **kwargs):
+    change_author_stats(instance.author_id, 'followers_count', -1)
+    timeline.remove_author(instance.user_id, instance.author_id)
+    timeline.refill_former_popular(instance.author_id)
+
+
+def bump_version(kind, pk):
+    """
+    Меняет версию карточки после коммита.
+
+    До коммита параллельный читатель мог бы взять новую версию, прочитать
+    ещё старую строку и закэшировать старую карточку под новым ключом.
+    """
+    transaction.on_commit(lambda: cards.bump_version(kind, pk))
+
+
+def bump_generation():
+    transaction.on_commit(page_cache.bump_generation)
+
+
+@receiver(post_save, sender=Post)
+def invalidate_post_caches(sender, instance, created, **kwargs):
+    bump_version('post', instance.pk)
+    if created:
+        bump_generation()
+
+
+@receiver(post_delete, sender=Post)
+def evict_deleted_post(sender, instance, **kwargs):
+    bump_version('post', instance.pk)
+    bump_generation()
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Comment)
+def notify_live_feeds(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        live.reset_latest()
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_caches(sender, instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    bump_version('user', instance.pk)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_caches(sender, instance, **kwargs):
+    bump_version('group', instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def index_saved_post(sender, instance, update_fields=None, **kwargs):
+    if update_fields and 'text' not in update_fields:
+        return
+    search.index_post(instance)
+
+
+@receiver(post_save, sender=Comment)
+def index_saved_comment(sender, instance, **kwargs):
+    search.index_comment(instance)
+
+
+@receiver(post_save, sender=Group)
+def index_saved_group(sender, instance, **kwargs):
+    search.index_group(instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_deleted_post(sender, instance, **kwargs):
+    search.unindex(search.POST, instance.pk)
+
+
+@receiver(post_delete, sender=Comment)
+def unindex_deleted_comment(sender, instance, **kwargs):
+    search.unindex(search.COMMENT, instance.pk)
+
+
+@receiver(post_delete, sender=Group)
+def unindex_deleted_group(sender, instance, **kwargs):
+    search.unindex(search.GROUP, instance.pk)
@@ -0,0 +1,58 @@
+"""
+Хранилище картинок постов, адресуемое по содержимому.
+
+Имя файла — SHA-256 его содержимого: posts/ab/abcdef….jpg. Одинаковые
+картинки, загруженные повторно или в разные посты, ложатся в один
+файл, а файл под таким именем никогда не меняется, поэтому его можно
+кэшировать сколько угодно. Файлы не удаляются вместе с постом: их
+могут делить несколько постов. Осиротевшие файлы удаляет команда
+collect_media.
+
+Повторная загрузка уже лежащего файла обновляет его mtime: файл мог
+осиротеть давно, и без этого collect_media удалил бы его, пока пост
+с новой ссылкой ещё не сохранён. Если тот же файл одновременно
+пишут два запроса, второй тоже считает его найденным, а не получает
+имя с суффиксом.
+"""
+import hashlib
+import os
+
+from django.core.files.base import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+def content_hash(content):
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    def content_name(self, name, content):
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        digest = content_hash(content)
+        return f'{directory}/{digest[:2]}/{digest}{extension}'.lstrip('/')
+
+    def save(self, name, content, max_length=None):
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.content_name(name, content)
+        try:
+            return super().save(name, content, max_length)
+        except FileExistsError:
+            os.utime(self.path(name))
+            return name
+
+    def get_available_name(self, name, max_length=None):
+        """Имя задаёт содержимое, поэтому занятое имя — это дубликат."""
+        if self.exists(name):
+            raise FileExistsError(name)
+        return name
+
+
+image_storage = ContentAddressedStorage()
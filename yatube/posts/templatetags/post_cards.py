@@ -0,0 +1,15 @@
+from django import template
+
+from posts import cards
+
+register = template.Library()
+
+
+@register.filter
+def card_version(post):
+    return cards.card_version(post)
+
+
+@register.simple_tag
+def card_ttl():
+    return cards.card_ttl()
@@ -0,0 +1,112 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='api_author')
+        cls.reader = User.objects.create_user(username='api_reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='api-group', description='Описание'
+        )
+        cls.posts = [
+            Post.objects.create(
+                text=f'Пост {i}', author=cls.author, group=cls.group
+            )
+            for i in range(5)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def get(self, name, *args, **headers):
+        return self.client.get(reverse(f'api_v1:{name}', args=args), **headers)
+
+    def test_index_shape(self):
+        """Лента отдаётся компактным JSON с нужными полями."""
+        response = self.get('index')
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertNotIn(b', ', response.content)
+        post = response.json()['results'][0]
+        self.assertEqual(post['id'], self.posts[-1].pk)
+        self.assertEqual(post['author'], 'api_author')
+        self.assertEqual(post['group'], 'api-group')
+        self.assertEqual(post['comments'], 0)
+        self.assertIsNone(post['image'])
+
+    def test_not_modified(self):
+        """Тот же ETag в If-None-Match даёт 304 без тела."""
+        etag = self.get('index')['ETag']
+        response = self.get('index', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    @mock.patch('django.db.transaction.on_commit', lambda func: func())
+    def test_etag_changes(self):
+        """ETag меняется после правки поста и нового комментария."""
+        post = self.posts[-1]
+        etags = [self.get('post_detail', post.pk)['ETag']]
+        post.text = 'Исправленный пост'
+        post.save()
+        etags.append(self.get('post_detail', post.pk)['ETag'])
+        Comment.objects.create(post=post, author=self.reader, text='Ок')
+        etags.append(self.get('post_detail', post.pk)['ETag'])
+        self.assertEqual(len(set(etags)), 3)
+        data = self.get('post_detail', post.pk).json()
+        self.assertEqual(data['post']['comments'], 1)
+        self.assertEqual(data['comments'][0]['text'], 'Ок')
+
+    def test_cursor_pages(self):
+        """Курсор продолжает ленту без повторов."""
+        seen = []
+        cursor = ''
+        with mock.patch('posts.api.POSTS_COUNT', 2):
+            while cursor is not None:
+                data = self.client.get(
+                    reverse('api_v1:group_posts', args=['api-group']),
+                    {'cursor': cursor}
+                ).json()
+                seen.extend(post['id'] for post in data['results'])
+                cursor = data['next_cursor']
+        self.assertEqual(seen, [post.pk for post in self.posts[::-1]])
+        self.assertEqual(data['group']['title'], 'Группа')
+
+    def test_profile_depends_on_user(self):
+        """Профиль зависит от пользователя и помечен Vary: Cookie."""
+        anonymous = self.get('profile', 'api_author')
+        self.assertIn('Cookie', anonymous['Vary'])
+        self.assertFalse(anonymous.json()['author']['following'])
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.client.force_login(self.reader)
+        response = self.get('profile', 'api_author')
+        self.assertTrue(response.json()['author']['following'])
+        self.assertNotEqual(response['ETag'], anonymous['ETag'])
+
+    def test_follow_requires_login(self):
+        """Лента подписок без авторизации отвечает 401 в JSON."""
+        response = self.get('follow_index')
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('detail', response.json())
+
+    def test_missing_objects(self):
+        """Несуществующие объекты — 404 в JSON."""
+        for name, arg in (
+            ('post_detail', self.posts[-1].pk + 100),
+            ('group_posts', 'missing'),
+            ('profile', 'missing'),
+        ):
+            with self.subTest(name=name):
+                response = self.get(name, arg)
+                self.assertEqual(response.status_code, 404)
+                self.assertIn('detail', response.json())
@@ -0,0 +1,61 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.management.commands.bench_endpoints import (
+    Command, compare, measure
+)
+from posts.models import Post
+
+User = get_user_model()
+
+
+def results(p50, queries, posts=1000):
+    return {'runs': [{
+        'posts': posts,
+        'endpoints': {'index': {'p50_ms': p50, 'queries': queries}},
+    }]}
+
+
+class BenchEndpointsTest(TestCase):
+    def test_measure(self):
+        """Метрики содержат перцентили, запросы и память."""
+        author = User.objects.create_user(username='bench_author')
+        Post.objects.create(text='Пост', author=author)
+        metrics = measure(Client(), 'get', reverse('posts:index'), requests=3)
+        self.assertEqual(metrics['requests'], 3)
+        self.assertLessEqual(metrics['p50_ms'], metrics['p99_ms'])
+        self.assertGreater(metrics['queries'], 0)
+        self.assertGreater(metrics['peak_kb'], 0)
+
+    def test_compare(self):
+        """Регрессией считается рост p50 сверх допуска и новые запросы."""
+        baseline = results(10, 5)
+        self.assertEqual(compare(results(11, 5), baseline, 0.2), [])
+        self.assertEqual(len(compare(results(13, 5), baseline, 0.2)), 1)
+        self.assertEqual(len(compare(results(10, 6), baseline, 0.2)), 1)
+        self.assertEqual(
+            compare(results(99, 99, posts=5000), baseline, 0.2), []
+        )
+
+    def test_shared_cache_is_untouched(self):
+        """Прогон пишет и очищает только свой кэш."""
+        cache.set('shared', 'value')
+
+        def run(command, size, options):
+            cache.clear()
+            cache.set('bench_only', 'bench')
+            return {'posts': size, 'endpoints': {}}
+
+        with mock.patch.object(Command, 'run', run), \
+                mock.patch.object(connection.creation, 'create_test_db'), \
+                mock.patch.object(connection.creation, 'destroy_test_db'):
+            call_command('bench_endpoints', sizes=[10], stdout=StringIO())
+        self.assertEqual(cache.get('shared'), 'value')
+        self.assertIsNone(cache.get('bench_only'))
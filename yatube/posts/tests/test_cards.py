@@ -0,0 +1,82 @@
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import cards
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+class PostCardCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.author = User.objects.create_user(
+            username='card_author', first_name='Лев', last_name='Толстой'
+        )
+        self.group = Group.objects.create(
+            title='card_group',
+            slug='card-group',
+            description='card_description'
+        )
+        self.post = Post.objects.create(
+            text='card_text', author=self.author, group=self.group
+        )
+        self.group_url = reverse('posts:group_list', args=[self.group.slug])
+        self.profile_url = reverse(
+            'posts:profile', args=[self.author.username]
+        )
+
+    def test_card_is_reused_between_feeds(self):
+        """Карточка, отрисованная в одной ленте, берётся из кэша в другой."""
+        self.guest_client.get(self.group_url)
+        Post.objects.filter(pk=self.post.pk).update(text='silent_update')
+        response = self.guest_client.get(self.profile_url)
+        self.assertContains(response, 'card_text')
+        self.assertNotContains(response, 'silent_update')
+
+    @mock.patch('django.db.transaction.on_commit', lambda func: func())
+    def test_post_edit_invalidates_card(self):
+        """Сохранение поста сразу меняет его карточку."""
+        self.guest_client.get(self.group_url)
+        self.post.text = 'edited_text'
+        self.post.save()
+        response = self.guest_client.get(self.profile_url)
+        self.assertContains(response, 'edited_text')
+
+    def test_replica_card_is_kept_apart(self):
+        """Карточка из реплики не попадает читателям default."""
+        with mock.patch('posts.cards.current_replica',
+                        return_value='replica_1'):
+            self.guest_client.get(self.group_url)
+            self.assertEqual(cards.card_ttl(), settings.REPLICA_STICKY_SECONDS)
+        Post.objects.filter(pk=self.post.pk).update(text='silent_update')
+        response = self.guest_client.get(self.profile_url)
+        self.assertContains(response, 'silent_update')
+        self.assertIsNone(cards.card_ttl())
+
+    def test_version_changes_after_commit(self):
+        """Версия карточки меняется только после коммита правки."""
+        key = cards.version_key('post', self.post.pk)
+        before = cards.card_versions([self.post])[key]
+        callbacks = []
+        with mock.patch('django.db.transaction.on_commit', callbacks.append):
+            self.post.save()
+        self.assertEqual(cache.get(key), before)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(cache.get(key), before)
+
+    @mock.patch('django.db.transaction.on_commit', lambda func: func())
+    def test_author_edit_invalidates_card(self):
+        """Изменение имени автора сразу меняет карточки его постов."""
+        self.guest_client.get(self.group_url)
+        self.author.first_name = 'Алексей'
+        self.author.save()
+        response = self.guest_client.get(self.group_url)
+        self.assertContains(response, 'Алексей Толстой')
@@ -0,0 +1,94 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Post
+
+User = get_user_model()
+
+
+@mock.patch('posts.views.COMMENTS_COUNT', 3)
+class CommentPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='comment_author')
+        cls.post = Post.objects.create(text='Пост', author=cls.author)
+        cls.comments = [
+            Comment.objects.create(
+                post=cls.post,
+                author=User.objects.create_user(username=f'reader_{i}'),
+                text=f'Комментарий {i}',
+            )
+            for i in range(7)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def detail(self, **params):
+        return self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk]), params
+        )
+
+    def fragment(self, **params):
+        return self.client.get(
+            reverse('posts:post_comments', args=[self.post.pk]), params
+        )
+
+    def test_first_page_is_bounded(self):
+        """На странице поста только первые комментарии, новые сверху."""
+        response = self.detail()
+        comments = list(response.context['comments'])
+        self.assertEqual(comments, self.comments[::-1][:3])
+        self.assertContains(response, 'Показать ещё комментарии')
+
+    def test_query_count_does_not_grow_with_comments(self):
+        """Авторы комментариев загружаются одним запросом с постами."""
+        with CaptureQueriesContext(connection) as before:
+            self.detail()
+        Comment.objects.create(
+            post=self.post,
+            author=User.objects.create_user(username='late_reader'),
+            text='Ещё один',
+        )
+        cache.clear()
+        with CaptureQueriesContext(connection) as after:
+            self.detail()
+        self.assertEqual(len(after), len(before))
+
+    def test_fragment_continues_from_cursor(self):
+        """Фрагмент отдаёт следующую страницу без повторов."""
+        first = self.detail().context['comments']
+        response = self.fragment(cursor=first.next_cursor)
+        self.assertTemplateUsed(response, 'posts/includes/comments.html')
+        self.assertTemplateNotUsed(response, 'base.html')
+        self.assertEqual(
+            list(response.context['comments']), self.comments[::-1][3:6]
+        )
+
+    def test_json_pages_cover_all_comments(self):
+        """JSON-ответы по курсору вместе дают все комментарии."""
+        seen = []
+        cursor = ''
+        while cursor is not None:
+            data = self.fragment(format='json', cursor=cursor).json()
+            seen.extend(comment['id'] for comment in data['comments'])
+            cursor = data['next_cursor']
+        self.assertEqual(
+            seen, [comment.pk for comment in self.comments[::-1]]
+        )
+        self.assertEqual(data['comments'][0]['author'], 'reader_0')
+
+    def test_missing_post(self):
+        """Для несуществующего поста фрагмент отвечает 404."""
+        response = self.client.get(
+            reverse('posts:post_comments', args=[self.post.pk + 100])
+        )
+        self.assertEqual(response.status_code, 404)
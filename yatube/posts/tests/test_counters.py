@@ -0,0 +1,78 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import AuthorStats, Comment, Group, Post
+
+User = get_user_model()
+
+
+class CountersTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='counter_author')
+        self.group = Group.objects.create(
+            title='counter_group',
+            slug='counter-group',
+            description='counter_description'
+        )
+        self.other_group = Group.objects.create(
+            title='other_group',
+            slug='other-group',
+            description='other_description'
+        )
+
+    def assertCounters(self, author_posts, group_posts, other_group_posts):
+        self.assertEqual(
+            AuthorStats.objects.get(user=self.author).posts_count,
+            author_posts
+        )
+        self.group.refresh_from_db()
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, group_posts)
+        self.assertEqual(self.other_group.posts_count, other_group_posts)
+
+    def test_post_counters_follow_create_edit_delete(self):
+        """Счётчики постов меняются при создании, переносе и удалении."""
+        post = Post.objects.create(
+            text='counter_post', author=self.author, group=self.group
+        )
+        Post.objects.create(text='no_group_post', author=self.author)
+        self.assertCounters(2, 1, 0)
+        post.group = self.other_group
+        post.save()
+        self.assertCounters(2, 0, 1)
+        post.delete()
+        self.assertCounters(1, 0, 0)
+
+    def test_comment_counter(self):
+        """Счётчик комментариев меняется при добавлении и удалении."""
+        post = Post.objects.create(text='counter_post', author=self.author)
+        comment = Comment.objects.create(
+            post=post, author=self.author, text='comment'
+        )
+        Comment.objects.create(post=post, author=self.author, text='comment')
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 2)
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+
+    def test_rebuild_counters_command(self):
+        """Команда rebuild_counters исправляет счётчики после bulk_create."""
+        Post.objects.bulk_create(
+            Post(text='bulk_post', author=self.author, group=self.group)
+            for _ in range(3)
+        )
+        call_command('rebuild_counters', stdout=StringIO())
+        self.assertCounters(3, 3, 0)
+
+    def test_profile_does_not_count_posts(self):
+        """Профиль показывает число постов без COUNT по таблице постов."""
+        Post.objects.create(text='counter_post', author=self.author)
+        response = Client().get(
+            reverse('posts:profile', args=[self.author.username])
+        )
+        self.assertContains(response, 'Всего постов: 1')
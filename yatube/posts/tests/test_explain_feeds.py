@@ -0,0 +1,26 @@
+import subprocess
+import sys
+
+from django.conf import settings
+from django.test import SimpleTestCase
+
+
+class ExplainFeedsTest(SimpleTestCase):
+    def test_command_runs(self):
+        """Команда проходит миграции и печатает планы до и после индексов.
+
+        Она сама создаёт и удаляет тестовую базу, поэтому запускается
+        отдельным процессом.
+        """
+        result = subprocess.run(
+            [
+                sys.executable, 'manage.py', 'explain_feeds',
+                '--users', '10', '--groups', '2',
+                '--posts', '50', '--follows', '3',
+            ],
+            cwd=settings.BASE_DIR, capture_output=True, text=True
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn('До индексов', result.stdout)
+        self.assertIn('После индексов', result.stdout)
+        self.assertIn('timeline_user_pub_date_idx', result.stdout)
@@ -1,5 +1,6 @@
 import shutil
 import tempfile
+from unittest import mock
 
 from django.contrib.auth import get_user_model
 from django.conf import settings
@@ -154,6 +155,21 @@ class PostFormTests(TestCase):
             ).exists()
         )
 
+    def test_only_saving_holds_write_lock(self):
+        """Под блокировкой записи выполняется только сохранение поста."""
+        url = reverse('posts:post_create')
+        with mock.patch(
+            'posts.views.serialized_write',
+            side_effect=lambda func, *args, **kwargs: func(*args, **kwargs)
+        ) as write:
+            PostFormTests.author_client.get(url)
+            write.assert_not_called()
+            PostFormTests.author_client.post(url, {'text': 'locked'})
+        write.assert_called_once()
+        saved = write.call_args[0][0]
+        self.assertEqual(saved.__self__, Post.objects.get(text='locked'))
+        self.assertEqual(saved.__name__, 'save')
+
     def test_post_comment(self):
         """Проверка создания нового комментария."""
         comments_count = Comment.objects.count()
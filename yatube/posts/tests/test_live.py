@@ -0,0 +1,82 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import live
+from posts.models import Comment, Follow, Post
+
+User = get_user_model()
+
+
+class LiveUpdatesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='live_author')
+        cls.other = User.objects.create_user(username='live_other')
+        cls.reader = User.objects.create_user(username='live_reader')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.post = Post.objects.create(text='Первый', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.since = live.format_since(live.latest())
+
+    def updates(self, feed='index', **headers):
+        return self.client.get(
+            reverse('api_v1:updates'),
+            {'feed': feed, 'since': self.since},
+            **headers
+        )
+
+    def test_nothing_new_skips_database(self):
+        """Без новых записей ответ 204 и ни одного запроса к базе."""
+        with self.assertNumQueries(0):
+            response = self.updates()
+        self.assertEqual(response.status_code, 204)
+
+    def test_new_post_and_comment(self):
+        """Новый пост и комментарий видны в ответе сразу после создания."""
+        post = Post.objects.create(text='Свежий', author=self.other)
+        Comment.objects.create(post=self.post, author=self.other, text='!')
+        data = self.updates().json()
+        self.assertEqual(data['new_posts'], 1)
+        self.assertEqual(data['cards'][0]['id'], post.pk)
+        self.assertEqual(data['new_comments'], {str(self.post.pk): 1})
+        self.assertEqual(data['since'], live.format_since(live.latest()))
+
+    @mock.patch('posts.live.MAX_LAG', 1)
+    def test_old_since_is_clamped(self):
+        """since=0.0 считает только последние MAX_LAG записей."""
+        for text in ('Свежий', 'Ещё свежее'):
+            Post.objects.create(text=text, author=self.other)
+        self.since = '0.0'
+        data = self.updates().json()
+        self.assertEqual(data['new_posts'], 1)
+        self.assertEqual(data['cards'][0]['text'], 'Ещё свежее')
+
+    def test_repeated_poll_not_modified(self):
+        """Повторный опрос без изменений получает 304."""
+        Post.objects.create(text='Свежий', author=self.other)
+        etag = self.updates()['ETag']
+        response = self.updates(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_follow_feed(self):
+        """Лента подписок считает только посты избранных авторов."""
+        self.assertEqual(self.updates('follow').status_code, 401)
+        self.client.force_login(self.reader)
+        Post.objects.create(text='Чужой', author=self.other)
+        Post.objects.create(text='Свой', author=self.author)
+        data = self.updates('follow').json()
+        self.assertEqual(data['new_posts'], 1)
+        self.assertEqual(data['cards'][0]['text'], 'Свой')
+
+    def test_feed_page_starts_polling(self):
+        """Главная страница передаёт скрипту текущее since."""
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, f'since={self.since}')
@@ -0,0 +1,69 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Post
+from posts.paginators import CursorPage, decode_cursor
+
+User = get_user_model()
+
+POSTS_TOTAL = 25
+
+
+class CursorPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.guest_client = Client()
+        cls.author = User.objects.create_user(username='cursor_author')
+        Post.objects.bulk_create(
+            Post(text=f'post {i}', author=cls.author)
+            for i in range(POSTS_TOTAL)
+        )
+
+    def get_page(self, **params):
+        response = CursorPaginatorTest.guest_client.get(
+            reverse('posts:profile', args=[CursorPaginatorTest.author]),
+            params
+        )
+        return response.context['page_obj']
+
+    def test_cursor_walks_all_posts(self):
+        """Курсор проходит всю ленту без пропусков и повторов."""
+        seen = []
+        page_obj = self.get_page()
+        self.assertIsInstance(page_obj, CursorPage)
+        self.assertFalse(page_obj.has_previous())
+        while True:
+            seen.extend(post.pk for post in page_obj)
+            if not page_obj.has_next():
+                break
+            page_obj = self.get_page(cursor=page_obj.next_cursor)
+        expected = list(
+            Post.objects.filter(
+                author=CursorPaginatorTest.author
+            ).values_list('pk', flat=True)
+        )
+        self.assertEqual(seen, expected)
+
+    def test_previous_cursor_returns_previous_page(self):
+        """Токен previous_cursor возвращает предыдущую страницу."""
+        first = self.get_page()
+        second = self.get_page(cursor=first.next_cursor)
+        back = self.get_page(cursor=second.previous_cursor)
+        self.assertEqual(list(back), list(first))
+        self.assertFalse(back.has_previous())
+        self.assertTrue(back.has_next())
+
+    def test_invalid_cursor_returns_first_page(self):
+        """Битый токен не ломает страницу, а отдаёт начало ленты."""
+        self.assertIsNone(decode_cursor('not-a-cursor'))
+        page_obj = self.get_page(cursor='not-a-cursor')
+        self.assertEqual(list(page_obj), list(self.get_page()))
+
+    def test_page_number_links_still_work(self):
+        """Старые ссылки ?page=N обслуживаются обычным пагинатором."""
+        page_obj = self.get_page(page=3)
+        self.assertNotIsInstance(page_obj, CursorPage)
+        self.assertEqual(page_obj.number, 3)
+        self.assertEqual(len(page_obj.object_list), 5)
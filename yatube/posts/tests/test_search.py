@@ -0,0 +1,127 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Group, Post
+from posts.search import SearchResults, stem
+
+User = get_user_model()
+
+
+class StemTest(TestCase):
+    def test_russian_stems(self):
+        """Формы слова сводятся к одной основе Snowball."""
+        cases = {
+            'котами': 'кот',
+            'коты': 'кот',
+            'важнейшие': 'важн',
+            'вагонов': 'вагон',
+            'красивая': 'красив',
+            'взглядом': 'взгляд',
+            'читающий': 'чита',
+            'радость': 'радост',
+            'вдохновение': 'вдохновен',
+            'ёлками': 'елк',
+        }
+        for word, expected in cases.items():
+            with self.subTest(word=word):
+                self.assertEqual(stem(word), expected)
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='search_author')
+        cls.group = Group.objects.create(
+            title='Путешествия по горам',
+            slug='travel',
+            description='Тестовое описание',
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def search(self, query):
+        return [
+            post.text
+            for post in SearchResults(query, Post.objects.all())[0:100]
+        ]
+
+    def test_finds_inflected_forms(self):
+        """Запрос находит пост с другой формой слова."""
+        Post.objects.create(text='Мои коты спят', author=self.author)
+        Post.objects.create(text='Про собак', author=self.author)
+        self.assertEqual(self.search('котами'), ['Мои коты спят'])
+
+    def test_all_words_required(self):
+        """Пост должен содержать все слова запроса."""
+        Post.objects.create(text='Кот и собака', author=self.author)
+        Post.objects.create(text='Только кот', author=self.author)
+        self.assertEqual(self.search('коты собаки'), ['Кот и собака'])
+
+    def test_ranking(self):
+        """Пост, где слово встречается чаще, выше в выдаче."""
+        Post.objects.create(
+            text='Кот и много других слов про разное', author=self.author
+        )
+        Post.objects.create(text='Кот, кот и ещё кот', author=self.author)
+        self.assertEqual(
+            self.search('кот'),
+            ['Кот, кот и ещё кот', 'Кот и много других слов про разное']
+        )
+
+    def test_finds_by_comment_and_group(self):
+        """Пост находится по комментарию и по названию группы."""
+        commented = Post.objects.create(text='Фото', author=self.author)
+        Comment.objects.create(
+            post=commented, author=self.author, text='Отличный закат'
+        )
+        Post.objects.create(
+            text='Маршрут', author=self.author, group=self.group
+        )
+        self.assertEqual(self.search('закаты'), ['Фото'])
+        self.assertEqual(self.search('горы'), ['Маршрут'])
+
+    def test_index_updates_on_save_and_delete(self):
+        """Правка и удаление сразу отражаются в индексе."""
+        post = Post.objects.create(text='Старый текст', author=self.author)
+        comment = Comment.objects.create(
+            post=post, author=self.author, text='Комментарий'
+        )
+        post.text = 'Новый текст'
+        post.save()
+        self.assertEqual(self.search('старый'), [])
+        self.assertEqual(self.search('новый'), ['Новый текст'])
+        comment.delete()
+        self.assertEqual(self.search('комментарий'), [])
+        post.delete()
+        self.assertEqual(self.search('новый'), [])
+        self.group.title = 'Реки'
+        self.group.save()
+        self.assertEqual(self.search('горы'), [])
+
+    def test_search_page_paginates_with_query(self):
+        """Страница поиска делится на страницы и сохраняет запрос."""
+        for i in range(3):
+            Post.objects.create(text=f'Кот номер {i}', author=self.author)
+        with mock.patch('posts.views.POSTS_COUNT', 2):
+            response = Client().get(
+                reverse('posts:search'), {'q': 'кот'}
+            )
+        page_obj = response.context['page_obj']
+        self.assertEqual(page_obj.paginator.count, 3)
+        self.assertEqual(len(page_obj), 2)
+        self.assertContains(
+            response, 'href="?q=%D0%BA%D0%BE%D1%82&amp;page=2"'
+        )
+
+    def test_empty_query(self):
+        """Пустой запрос ничего не ищет."""
+        Post.objects.create(text='Кот', author=self.author)
+        response = Client().get(reverse('posts:search'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['page_obj']), 0)
@@ -0,0 +1,85 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import Count, F
+from django.test import TestCase
+
+from posts.models import AuthorStats, Comment, Follow, Post, TimelineEntry
+from posts.search import SearchResults
+
+User = get_user_model()
+
+
+class SeedDataTest(TestCase):
+    def seed(self, **options):
+        call_command(
+            'seed_data',
+            users=40,
+            groups=3,
+            posts=300,
+            comments=500,
+            follows=5,
+            batch=70,
+            seed=1,
+            stdout=StringIO(),
+            **options
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_rows_and_derived_data(self):
+        """Строки созданы, счётчики, ленты и индекс согласованы с ними."""
+        self.seed()
+        self.assertEqual(User.objects.count(), 40)
+        self.assertEqual(Post.objects.count(), 300)
+        self.assertEqual(Comment.objects.count(), 500)
+        self.assertFalse(Follow.objects.filter(user=F('author')))
+        top = Post.objects.order_by('-comments_count').first()
+        self.assertEqual(top.comments_count, top.comments.count())
+        self.assertEqual(
+            sum(AuthorStats.objects.values_list('posts_count', flat=True)),
+            300
+        )
+        self.assertTrue(TimelineEntry.objects.exists())
+        self.assertTrue(SearchResults('кот', Post.objects.all()).count())
+
+    def test_skewed_popularity(self):
+        """Подписчики и комментарии распределены с перекосом."""
+        self.seed()
+        followers = sorted(
+            Follow.objects.values('author').annotate(
+                total=Count('pk')
+            ).values_list('total', flat=True),
+            reverse=True
+        )
+        self.assertGreater(followers[0], 4 * followers[len(followers) // 2])
+        comments = list(Post.objects.order_by(
+            '-comments_count'
+        ).values_list('comments_count', flat=True))
+        self.assertGreater(comments[0], 10 * comments[len(comments) // 2])
+
+    def test_prefix_must_be_new(self):
+        """Повторный запуск с тем же префиксом отклоняется."""
+        self.seed()
+        with self.assertRaises(CommandError):
+            self.seed()
+
+    def test_seed_after_deleting_newest_rows(self):
+        """pk новых строк идут после удалённых, а не после max(pk)."""
+        self.seed()
+        Post.objects.filter(
+            pk__in=Post.objects.order_by('-pk').values('pk')[:10]
+        ).delete()
+        self.seed(prefix='again')
+        self.assertEqual(Post.objects.count(), 590)
+        self.assertEqual(
+            Comment.objects.filter(
+                author__username__startswith='again_',
+                post__author__username__startswith='again_'
+            ).count(),
+            500
+        )
@@ -0,0 +1,117 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from posts.management.commands.collect_media import count_references
+from posts.models import Post
+from posts.storage import ContentAddressedStorage, image_storage
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x01\x00'
+    b'\x01\x00\x00\x00\x00\x21\xf9\x04'
+    b'\x01\x0a\x00\x01\x00\x2c\x00\x00'
+    b'\x00\x00\x01\x00\x01\x00\x00\x02'
+    b'\x02\x4c\x01\x00\x3b'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedStorageTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='storage_author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self, name='small.gif'):
+        return Post.objects.create(
+            text='storage',
+            author=self.author,
+            image=SimpleUploadedFile(
+                name=name, content=SMALL_GIF, content_type='image/gif'
+            )
+        )
+
+    def collect(self):
+        call_command('collect_media', '--grace', '0', stdout=StringIO())
+
+    def test_duplicates_share_one_file(self):
+        """Одинаковые картинки разных постов хранятся одним файлом."""
+        first = self.create_post('first.gif')
+        second = self.create_post('second.GIF')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertRegex(
+            first.image.name, r'^posts/[0-9a-f]{2}/[0-9a-f]{64}\.gif$'
+        )
+        _, files = image_storage.listdir(first.image.name.rsplit('/', 1)[0])
+        self.assertEqual(len(files), 1)
+
+    def test_collect_keeps_shared_file(self):
+        """Файл остаётся, пока на него ссылается хотя бы один пост."""
+        first = self.create_post()
+        second = self.create_post()
+        first.delete()
+        self.collect()
+        self.assertTrue(image_storage.exists(second.image.name))
+        second.delete()
+        self.collect()
+        self.assertFalse(image_storage.exists(second.image.name))
+
+    def test_collect_respects_grace_period(self):
+        """Свежие файлы без ссылок не удаляются."""
+        post = self.create_post()
+        post.delete()
+        call_command('collect_media', stdout=StringIO())
+        self.assertTrue(image_storage.exists(post.image.name))
+
+    def test_dry_run_deletes_nothing(self):
+        """--dry-run только считает файлы."""
+        post = self.create_post()
+        post.delete()
+        call_command(
+            'collect_media', '--grace', '0', '--dry-run', stdout=StringIO()
+        )
+        self.assertTrue(image_storage.exists(post.image.name))
+
+    def test_reupload_refreshes_orphan(self):
+        """Повторная загрузка продлевает жизнь давно осиротевшему файлу."""
+        post = self.create_post()
+        post.delete()
+        path = image_storage.path(post.image.name)
+        os.utime(path, (0, 0))
+
+        def upload_after_mark():
+            references = count_references()
+            self.create_post()
+            return references
+
+        with mock.patch(
+            'posts.management.commands.collect_media.count_references',
+            upload_after_mark
+        ):
+            call_command('collect_media', stdout=StringIO())
+        self.assertTrue(image_storage.exists(post.image.name))
+
+    def test_concurrent_save_is_a_duplicate(self):
+        """Файл, записанный другим запросом между проверкой и записью."""
+        first = self.create_post()
+        with mock.patch.object(
+            ContentAddressedStorage, 'exists', side_effect=[False, True]
+        ):
+            second = self.create_post()
+        self.assertEqual(second.image.name, first.image.name)
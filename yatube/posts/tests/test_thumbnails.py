@@ -0,0 +1,214 @@
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post
+from posts.thumbnails import (
+    WIDTHS, build_variants, make_thumbnail, prefetch_thumbnails,
+    supported_formats
+)
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x01\x00'
+    b'\x01\x00\x00\x00\x00\x21\xf9\x04'
+    b'\x01\x0a\x00\x01\x00\x2c\x00\x00'
+    b'\x00\x00\x01\x00\x01\x00\x00\x02'
+    b'\x02\x4c\x01\x00\x3b'
+)
+OTHER_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x01\x00'
+    b'\x01\x00\x80\x00\x00\xff\xff\xff'
+    b'\x00\x00\x00\x21\xf9\x04\x01\x0a'
+    b'\x00\x01\x00\x2c\x00\x00\x00\x00'
+    b'\x01\x00\x01\x00\x00\x02\x02\x44'
+    b'\x01\x00\x3b'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailPipelineTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='thumb_author')
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def upload(self, name='small.gif', content=SMALL_GIF):
+        return SimpleUploadedFile(
+            name=name, content=content, content_type='image/gif'
+        )
+
+    def test_post_create_schedules_thumbnail(self):
+        """Создание поста с картинкой ставит миниатюру в очередь."""
+        with mock.patch('posts.views.schedule_thumbnail') as schedule:
+            self.author_client.post(
+                reverse('posts:post_create'),
+                {'text': 'with_image', 'image': self.upload()}
+            )
+        post = Post.objects.get(text='with_image')
+        self.assertTrue(post.image)
+        schedule.assert_called_once_with(post)
+
+    def test_feed_renders_precomputed_thumbnail(self):
+        """Лента выводит готовую миниатюру с размерами."""
+        post = Post.objects.create(
+            text='thumb_post', author=self.author, image=self.upload()
+        )
+        make_thumbnail(post.pk)
+        post.refresh_from_db()
+        self.assertEqual(
+            (post.thumbnail_width, post.thumbnail_height), (960, 339)
+        )
+        with mock.patch('sorl.thumbnail.get_thumbnail') as get_thumbnail:
+            response = Client().get(
+                reverse('posts:profile', args=[self.author.username])
+            )
+        get_thumbnail.assert_not_called()
+        self.assertContains(
+            response, f'src="{post.thumbnail.url}" width="960" height="339"'
+        )
+
+    def test_outdated_task_is_skipped(self):
+        """Задача для заменённой картинки не перезаписывает миниатюру."""
+        post = Post.objects.create(
+            text='thumb_post', author=self.author, image=self.upload()
+        )
+        make_thumbnail(post.pk, image_name='posts/replaced.gif')
+        post.refresh_from_db()
+        self.assertFalse(post.thumbnail)
+
+    def test_variants_for_every_width_and_format(self):
+        """Для каждой ширины строится вариант в каждом доступном формате."""
+        post = Post.objects.create(
+            text='thumb_post', author=self.author, image=self.upload()
+        )
+        make_thumbnail(post.pk)
+        post.refresh_from_db()
+        self.assertEqual(
+            {(variant['type'], variant['width']) for variant in post.variants},
+            {(mime, width)
+             for width in WIDTHS
+             for _, mime, _, _ in supported_formats()}
+        )
+        for variant in post.variants:
+            self.assertTrue(default_storage.exists(variant['name']))
+
+    def test_feed_renders_picture_sources(self):
+        """Карточка поста выводит <source> с srcset для каждого формата."""
+        post = Post.objects.create(
+            text='thumb_post', author=self.author, image=self.upload()
+        )
+        make_thumbnail(post.pk)
+        post.refresh_from_db()
+        response = Client().get(
+            reverse('posts:profile', args=[self.author.username])
+        )
+        for source in post.image_sources:
+            self.assertContains(
+                response,
+                f'<source type="{source["type"]}" '
+                f'srcset="{source["srcset"]}"'
+            )
+
+    def test_image_replaced_during_build(self):
+        """Замена картинки во время сборки не даёт записать старые варианты."""
+        post = Post.objects.create(
+            text='thumb_post', author=self.author, image=self.upload()
+        )
+        built = []
+
+        def build_and_replace(post):
+            built.extend(build_variants(post))
+            Post.objects.filter(pk=post.pk).update(image='posts/other.gif')
+            return built
+
+        with mock.patch('posts.thumbnails.build_variants', build_and_replace):
+            make_thumbnail(post.pk, post.image.name)
+        post.refresh_from_db()
+        self.assertFalse(post.thumbnail)
+        self.assertFalse(post.image_variants)
+        self.assertTrue(built)
+        for variant in built:
+            self.assertFalse(default_storage.exists(variant['name']))
+
+    def test_rebuild_removes_old_variants(self):
+        """После замены картинки файлы прежних вариантов удаляются."""
+        post = Post.objects.create(
+            text='thumb_post', author=self.author, image=self.upload()
+        )
+        make_thumbnail(post.pk)
+        post.refresh_from_db()
+        old_names = [variant['name'] for variant in post.variants]
+        post.image = self.upload('replaced.gif', OTHER_GIF)
+        post.save()
+        make_thumbnail(post.pk)
+        post.refresh_from_db()
+        self.assertTrue(post.variants)
+        for name in old_names:
+            self.assertFalse(default_storage.exists(name))
+
+    @mock.patch('django.db.transaction.on_commit', lambda func: func())
+    def test_post_edit_removes_old_variants(self):
+        """Замена картинки через форму удаляет прежние варианты."""
+        post = Post.objects.create(
+            text='thumb_post', author=self.author, image=self.upload()
+        )
+        make_thumbnail(post.pk)
+        post.refresh_from_db()
+        old_names = [variant['name'] for variant in post.variants]
+        with mock.patch('posts.thumbnails.submit'):
+            self.author_client.post(
+                reverse('posts:post_edit', args=[post.pk]),
+                {'text': 'thumb_post',
+                 'image': self.upload('replaced.gif', OTHER_GIF)}
+            )
+        post.refresh_from_db()
+        self.assertFalse(post.variants)
+        for name in old_names:
+            self.assertFalse(default_storage.exists(name))
+
+    def test_feed_image_bytes_command(self):
+        """Команда сравнивает байты оригиналов и вариантов."""
+        post = Post.objects.create(
+            text='thumb_post', author=self.author, image=self.upload()
+        )
+        make_thumbnail(post.pk)
+        out = StringIO()
+        call_command('feed_image_bytes', '--width', '480', stdout=out)
+        self.assertIn('<picture> при ширине 480px', out.getvalue())
+
+    def test_prefetch_requeues_missing_thumbnails_once(self):
+        """Посты страницы без вариантов ставятся в очередь один раз."""
+        ready = Post.objects.create(
+            text='ready', author=self.author, image=self.upload()
+        )
+        make_thumbnail(ready.pk)
+        missing = Post.objects.create(
+            text='missing', author=self.author, image=self.upload()
+        )
+        Post.objects.create(text='no_image', author=self.author)
+        posts = list(Post.objects.feed())
+        with mock.patch('posts.thumbnails.submit') as submit, \
+                mock.patch('django.db.transaction.on_commit',
+                           side_effect=lambda func: func()):
+            prefetch_thumbnails(posts)
+            prefetch_thumbnails(posts)
+        submit.assert_called_once_with(missing.pk, missing.image.name)
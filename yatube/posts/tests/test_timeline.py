@@ -0,0 +1,86 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Follow, Post, TimelineEntry
+from posts.timeline import follow_feed
+
+User = get_user_model()
+
+
+class TimelineTest(TestCase):
+    def setUp(self):
+        self.reader = User.objects.create_user(username='reader')
+        self.author = User.objects.create_user(username='author')
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_new_post_is_fanned_out_to_followers(self):
+        """Новый пост попадает в материализованную ленту подписчика."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text='fan_out', author=self.author)
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.reader, post=post).exists()
+        )
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        self.assertIn(post, response.context['page_obj'].object_list)
+
+    def test_follow_and_unfollow_update_timeline(self):
+        """Подписка заполняет ленту старыми постами, отписка очищает её."""
+        post = Post.objects.create(text='old_post', author=self.author)
+        self.reader_client.get(
+            reverse('posts:profile_follow', args=[self.author.username])
+        )
+        self.assertEqual(list(follow_feed(self.reader)), [post])
+        Follow.objects.get(user=self.reader, author=self.author).delete()
+        self.assertFalse(TimelineEntry.objects.filter(user=self.reader))
+
+    def test_popular_author_is_read_on_demand(self):
+        """Посты популярного автора не раскладываются, но видны в ленте."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        with mock.patch('posts.timeline.FANOUT_LIMIT', 1):
+            post = Post.objects.create(text='popular', author=self.author)
+            self.assertFalse(TimelineEntry.objects.filter(post=post))
+            self.assertIn(post, follow_feed(self.reader))
+
+    @mock.patch('posts.timeline.FANOUT_LIMIT', 2)
+    def test_former_popular_author_is_refilled(self):
+        """Посты, написанные при популярности, остаются в ленте после."""
+        other = User.objects.create_user(username='other_reader')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=other, author=self.author)
+        post = Post.objects.create(text='popular', author=self.author)
+        self.assertFalse(TimelineEntry.objects.filter(post=post))
+        Follow.objects.get(user=other, author=self.author).delete()
+        self.assertEqual(list(follow_feed(self.reader)), [post])
+
+    def test_pages_follow_timeline_order(self):
+        """Курсор проходит ленту подписок по порядку без повторов."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        posts = [
+            Post.objects.create(text=f'post {i}', author=self.author)
+            for i in range(15)
+        ]
+        url = reverse('posts:follow_index')
+        page_obj = self.reader_client.get(url).context['page_obj']
+        seen = [post.pk for post in page_obj]
+        page_obj = self.reader_client.get(
+            url, {'cursor': page_obj.next_cursor}
+        ).context['page_obj']
+        seen += [post.pk for post in page_obj]
+        self.assertFalse(page_obj.has_next())
+        self.assertEqual(seen, [post.pk for post in reversed(posts)])
+
+    def test_timeline_is_read_without_sorting(self):
+        """Страница ленты читается по индексу, без сортировки в памяти."""
+        if connection.vendor != 'sqlite':
+            self.skipTest('План запроса проверяется только для SQLite.')
+        sql, params = follow_feed(self.reader)[:11].query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            plan = ' '.join(str(row[-1]) for row in cursor.fetchall())
+        self.assertIn('timeline_user_pub_date_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
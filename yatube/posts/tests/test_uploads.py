@@ -0,0 +1,98 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from posts import uploads
+from posts.models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_jpeg(size, name='photo.jpg'):
+    buffer = BytesIO()
+    Image.new('RGB', size, (200, 100, 50)).save(buffer, 'JPEG')
+    return SimpleUploadedFile(
+        name=name, content=buffer.getvalue(), content_type='image/jpeg'
+    )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class UploadTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='upload_author')
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def create_post(self, image):
+        with mock.patch('posts.views.schedule_thumbnail'):
+            return self.author_client.post(
+                reverse('posts:post_create'),
+                {'text': 'upload', 'image': image}
+            )
+
+    def test_large_original_is_downscaled(self):
+        """Оригинал больше MAX_SIDE уменьшается до сохранения."""
+        self.create_post(make_jpeg((uploads.MAX_SIDE * 2, 1000)))
+        post = Post.objects.get(text='upload')
+        self.assertTrue(post.image.name.startswith('posts/'))
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (uploads.MAX_SIDE, 500))
+
+    def test_small_original_is_kept(self):
+        """Небольшая картинка сохраняется без изменений."""
+        upload = make_jpeg((300, 200))
+        content = upload.read()
+        upload.seek(0)
+        self.create_post(upload)
+        post = Post.objects.get(text='upload')
+        with open(post.image.path, 'rb') as stored:
+            self.assertEqual(stored.read(), content)
+
+    def test_file_too_large(self):
+        """Файл больше MAX_UPLOAD_SIZE отклоняется формой."""
+        with mock.patch.object(uploads, 'MAX_UPLOAD_SIZE', 100):
+            response = self.create_post(make_jpeg((50, 50)))
+        self.assertFalse(Post.objects.filter(text='upload').exists())
+        self.assertTrue(
+            response.context['form'].has_error('image', 'file_too_large')
+        )
+
+    def test_too_many_pixels(self):
+        """Картинка больше MAX_PIXELS отклоняется по заголовку."""
+        with mock.patch.object(uploads, 'MAX_PIXELS', 100):
+            response = self.create_post(make_jpeg((50, 50)))
+        self.assertFalse(Post.objects.filter(text='upload').exists())
+        self.assertTrue(
+            response.context['form'].has_error('image', 'too_many_pixels')
+        )
+
+    def test_handler_stops_writing_over_limit(self):
+        """Обработчик не пишет на диск больше MAX_UPLOAD_SIZE."""
+        handler = uploads.BoundedUploadHandler()
+        handler.new_file('image', 'big.jpg', 'image/jpeg', None)
+        chunk = b'x' * uploads.CHUNK_SIZE
+        with mock.patch.object(uploads, 'MAX_UPLOAD_SIZE', 100000):
+            for start in range(0, 4 * len(chunk), len(chunk)):
+                handler.receive_data_chunk(chunk, start)
+        upload = handler.file_complete(4 * len(chunk))
+        self.assertEqual(upload.size, 4 * len(chunk))
+        self.assertEqual(
+            os.path.getsize(upload.temporary_file_path()), 100000
+        )
+        upload.close()
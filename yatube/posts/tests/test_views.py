@@ -1,12 +1,16 @@
 import shutil
 import tempfile
+import time
+from unittest import mock
 
 from django import forms
 from django.contrib.auth import get_user_model
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.cache import cache
+from django.db import connection
 from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from posts.models import Follow, Group, Post
@@ -217,15 +221,16 @@ class PostPagesTest(TestCase):
                     )
         self.assertEqual(len(response.context['page_obj'].object_list), count)
 
+    @mock.patch('django.db.transaction.on_commit', lambda func: func())
     def test_cache_index(self):
-        """Проверка хранения и очищения кэша для index."""
+        """Проверка хранения и адресной инвалидации кэша index."""
+        cache.clear()
         response = PostPagesTest.authorized_author_client.get(
             reverse('posts:index')
         )
         posts = response.content
-        Post.objects.create(
-            text='test_new_post',
-            author=PostPagesTest.author,
+        Post.objects.filter(pk=PostPagesTest.post.pk).update(
+            text='test_silent_update'
         )
         response_old = PostPagesTest.authorized_author_client.get(
             reverse('posts:index')
@@ -235,12 +240,90 @@ class PostPagesTest(TestCase):
             old_posts, posts,
             'Не возвращает кэшированную страницу.'
         )
-        cache.clear()
+        Post.objects.create(
+            text='test_new_post',
+            author=PostPagesTest.author,
+        )
         response_new = PostPagesTest.authorized_author_client.get(
             reverse('posts:index')
         )
-        new_posts = response_new.content
-        self.assertNotEqual(old_posts, new_posts, 'Нет сброса кэша.')
+        self.assertContains(
+            response_new, 'test_new_post',
+            msg_prefix='Новый пост не сбрасывает кэш.'
+        )
+
+    @mock.patch('django.db.transaction.on_commit', lambda func: func())
+    def test_cache_index_evicts_edited_post(self):
+        """Правка поста удаляет только страницы, где он показан."""
+        cache.clear()
+        newest = Post.objects.first()
+        PostPagesTest.authorized_author_client.get(reverse('posts:index'))
+        deep_page = {'page': 2}
+        PostPagesTest.authorized_author_client.get(
+            reverse('posts:index'), deep_page
+        )
+        Post.objects.exclude(pk=newest.pk).update(text='test_silent_update')
+        newest.text = 'test_edited_post'
+        newest.save()
+        response = PostPagesTest.authorized_author_client.get(
+            reverse('posts:index')
+        )
+        self.assertContains(response, 'test_edited_post')
+        response = PostPagesTest.authorized_author_client.get(
+            reverse('posts:index'), deep_page
+        )
+        self.assertNotContains(response, 'test_silent_update')
+
+    @mock.patch('django.db.transaction.on_commit', lambda func: func())
+    def test_cache_index_evicts_after_recompute(self):
+        """Правка видна и после перерисовки страницы по истечении срока."""
+        cache.clear()
+        client = PostPagesTest.authorized_author_client
+        start = time.time()
+
+        def get_index_at(hours):
+            with mock.patch('time.time', return_value=start + hours * 3600):
+                return client.get(reverse('posts:index'))
+
+        get_index_at(0)
+        get_index_at(9)
+        newest = Post.objects.first()
+        newest.text = 'test_edited_after_recompute'
+        with mock.patch('time.time', return_value=start + 13 * 3600):
+            newest.save()
+        self.assertContains(get_index_at(13), 'test_edited_after_recompute')
+
+    @mock.patch('django.db.transaction.on_commit', lambda func: func())
+    def test_cache_index_evicts_every_page_of_author(self):
+        """Правка автора сбрасывает все страницы с его постами."""
+        cache.clear()
+        client = PostPagesTest.authorized_author_client
+        pages = ({}, {'page': 2})
+        for params in pages:
+            client.get(reverse('posts:index'), params)
+        author = PostPagesTest.author
+        author.first_name = 'test_renamed'
+        author.save()
+        for params in pages:
+            with self.subTest(params=params):
+                self.assertContains(
+                    client.get(reverse('posts:index'), params),
+                    'test_renamed'
+                )
+
+    @mock.patch('django.db.transaction.on_commit', lambda func: func())
+    def test_cache_index_broken_cursor_follows_generation(self):
+        """Битый курсор даёт первую страницу, и новый пост её сбрасывает."""
+        cache.clear()
+        client = PostPagesTest.authorized_author_client
+        client.get(reverse('posts:index'), {'cursor': 'broken'})
+        Post.objects.create(text='test_after_broken', author=self.author)
+        for cursor in ('broken', 'other'):
+            with self.subTest(cursor=cursor):
+                self.assertContains(
+                    client.get(reverse('posts:index'), {'cursor': cursor}),
+                    'test_after_broken'
+                )
 
 
 class TestFollowPost(TestCase):
@@ -295,6 +378,19 @@ class TestFollowPost(TestCase):
             False
         )
 
+    def test_follow_twice_creates_one_subscription(self):
+        """Повторная подписка не создаёт дубликат."""
+        following = User.objects.create(username='following')
+        for _ in range(2):
+            self.response_post(
+                name='posts:profile_follow',
+                rev_args={'username': following}
+            )
+        self.assertEqual(
+            Follow.objects.filter(user=self.user, author=following).count(),
+            1
+        )
+
     def test_follow_new_post(self):
         """ 
         Новая запись пользователя появляется в ленте тех, кто на него
@@ -314,3 +410,90 @@ class TestFollowPost(TestCase):
         self.client.login(username='user_temp', password='pass')
         response = self.response_get(name='posts:follow_index')
         self.assertNotIn(post, response.context['page_obj'].object_list)
+
+
+class FeedQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.reader_client = Client()
+        cls.reader_client.force_login(cls.reader)
+        cls.group = Group.objects.create(
+            title='feed_group',
+            slug='feed-group',
+            description='feed_description'
+        )
+        authors = [
+            User.objects.create_user(
+                username=f'author_{i}', first_name='Имя', last_name='Фамилия'
+            )
+            for i in range(5)
+        ]
+        cls.author = authors[0]
+        Post.objects.bulk_create(
+            Post(
+                text=f'feed_post_{i}',
+                author=cls.author if i % 2 else authors[i % 5],
+                group=cls.group,
+            )
+            for i in range(40)
+        )
+        for author in authors:
+            Follow.objects.create(user=cls.reader, author=author)
+        cls.feeds = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[cls.group.slug]),
+            reverse('posts:profile', args=[cls.author.username]),
+            reverse('posts:follow_index'),
+        )
+
+    def count_queries(self, url, page_size):
+        cache.clear()
+        with mock.patch('posts.views.POSTS_COUNT', page_size):
+            with CaptureQueriesContext(connection) as queries:
+                response = FeedQueriesTest.reader_client.get(url)
+        self.assertEqual(
+            len(response.context['page_obj'].object_list), page_size
+        )
+        return len(queries)
+
+    def test_feed_queries_do_not_depend_on_page_size(self):
+        """Число запросов ленты не растёт вместе с размером страницы."""
+        for url in FeedQueriesTest.feeds:
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.count_queries(url, 2),
+                    self.count_queries(url, 15)
+                )
+
+    def test_follow_flag_is_part_of_main_query(self):
+        """Подписка на автора проверяется подзапросом, а не отдельно."""
+        author = self.reader.follower.first().author
+        post = author.posts.first()
+        for url in (
+            reverse('posts:profile', args=[author.username]),
+            reverse('posts:post_detail', args=[post.pk]),
+        ):
+            with self.subTest(url=url):
+                cache.clear()
+                with CaptureQueriesContext(connection) as queries:
+                    response = FeedQueriesTest.reader_client.get(url)
+                self.assertTrue(response.context['following'])
+                self.assertFalse([
+                    query for query in queries
+                    if query['sql'].startswith(
+                        'SELECT (1) AS "a" FROM "posts_follow"'
+                    )
+                ])
+
+    def test_cached_index_does_not_query_posts(self):
+        """Закэшированная главная страница не читает посты из базы."""
+        cache.clear()
+        client = Client()
+        client.get(reverse('posts:index'))
+        with CaptureQueriesContext(connection) as queries:
+            client.get(reverse('posts:index'))
+        self.assertFalse(
+            [query for query in queries if 'posts_post' in query['sql']]
+        )
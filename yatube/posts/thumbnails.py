@@ -0,0 +1,182 @@
+"""
+Миниатюры постов, подготовленные заранее.
+
+После сохранения формы с новой картинкой в пуле фоновых потоков
+строится набор вариантов: несколько ширин в AVIF/WebP и JPEG для
+старых браузеров. Список вариантов и JPEG-миниатюра 960px
+записываются в пост. Шаблоны только читают готовые поля и никогда
+не обрабатывают картинку во время запроса.
+
+Очередь пула живёт в памяти и пропадает при перезапуске. Поэтому
+ленты перед отрисовкой одним вызовом prefetch_thumbnails проверяют
+страницу и заново ставят в очередь посты без вариантов. Метка задачи
+в кэше не даёт поставить одну картинку в очередь повторно, так что
+после перезапуска каждая миниатюра строится один раз, а не на
+каждый запрос.
+"""
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from io import BytesIO
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from PIL import Image, ImageOps
+
+from . import cards
+from .models import Post
+
+try:
+    import pillow_avif  # noqa: F401
+except ImportError:
+    pass
+
+WIDTHS = (480, 960, 1440)
+THUMBNAIL_WIDTH = 960
+ASPECT_RATIO = 960 / 339
+FORMATS = (
+    ('AVIF', 'image/avif', 'avif', {'quality': 50}),
+    ('WEBP', 'image/webp', 'webp', {'quality': 75, 'method': 4}),
+    ('JPEG', 'image/jpeg', 'jpg', {'quality': 80, 'optimize': True,
+                                   'progressive': True}),
+)
+VARIANTS_DIR = 'posts/variants'
+WORKERS = 2
+JOB_KEY = 'thumbnail_job:{}'
+JOB_TIMEOUT = 60 * 10
+
+logger = logging.getLogger(__name__)
+executor = ThreadPoolExecutor(
+    max_workers=WORKERS, thread_name_prefix='thumbnails'
+)
+
+
+def supported_formats():
+    Image.init()
+    return [fmt for fmt in FORMATS if fmt[0] in Image.SAVE]
+
+
+def build_variants(post):
+    """Сохраняет варианты картинки поста и возвращает их описание."""
+    with post.image.open('rb') as image_file:
+        original = Image.open(image_file)
+        original = ImageOps.exif_transpose(original).convert('RGB')
+    stem = os.path.splitext(os.path.basename(post.image.name))[0]
+    variants = []
+    for width in WIDTHS:
+        size = (width, round(width / ASPECT_RATIO))
+        resized = ImageOps.fit(original, size, Image.LANCZOS)
+        for pil_format, mime, extension, options in supported_formats():
+            buffer = BytesIO()
+            resized.save(buffer, pil_format, **options)
+            name = default_storage.save(
+                f'{VARIANTS_DIR}/{post.pk}/{stem}-{width}.{extension}',
+                ContentFile(buffer.getvalue())
+            )
+            variants.append({
+                'type': mime,
+                'width': size[0],
+                'height': size[1],
+                'name': name,
+                'size': buffer.tell(),
+            })
+    return variants
+
+
+def variant_files(post):
+    """Имена файлов вариантов и миниатюры поста."""
+    names = [variant['name'] for variant in post.variants]
+    if post.thumbnail.name and post.thumbnail.name not in names:
+        names.append(post.thumbnail.name)
+    return names
+
+
+def delete_files(names):
+    for name in names:
+        default_storage.delete(name)
+
+
+def delete_variants(post):
+    delete_files(variant_files(post))
+
+
+def make_thumbnail(post_id, image_name=None):
+    """
+    Строит варианты картинки поста и сохраняет их в пост.
+
+    Если за время ожидания картинку поста успели заменить,
+    устаревшая задача ничего не делает. Если её заменили во время
+    сборки, запись не проходит, а собранные файлы удаляются.
+    """
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None:
+        return
+    if image_name is None:
+        image_name = post.image.name or ''
+    if (post.image.name or '') != image_name:
+        return
+    delete_variants(post)
+    variants = build_variants(post) if post.image else []
+    thumbnail = next(
+        (variant for variant in variants
+         if variant['type'] == 'image/jpeg'
+         and variant['width'] == THUMBNAIL_WIDTH),
+        None
+    )
+    updated = Post.objects.filter(pk=post_id, image=image_name).update(
+        image_variants=json.dumps(variants) if variants else '',
+        thumbnail=thumbnail['name'] if thumbnail else '',
+        thumbnail_width=thumbnail and thumbnail['width'],
+        thumbnail_height=thumbnail and thumbnail['height'],
+    )
+    if not updated:
+        delete_files(variant['name'] for variant in variants)
+        return
+    cards.bump_version('post', post_id)
+
+
+def run_in_worker(post_id, image_name):
+    try:
+        make_thumbnail(post_id, image_name)
+    except Exception:
+        logger.exception('Не удалось построить миниатюру поста %s', post_id)
+    finally:
+        connections.close_all()
+
+
+def submit(post_id, image_name):
+    executor.submit(run_in_worker, post_id, image_name)
+
+
+def schedule_thumbnail(post):
+    """Ставит построение миниатюры в очередь после коммита транзакции."""
+    image_name = post.image.name or ''
+    cache.set(JOB_KEY.format(post.pk), image_name, JOB_TIMEOUT)
+    transaction.on_commit(lambda: submit(post.pk, image_name))
+
+
+def prefetch_thumbnails(posts):
+    """
+    Проверяет миниатюры всех постов страницы за один проход.
+
+    Готовые варианты уже загружены вместе с постами. Для картинок без
+    вариантов задача ставится в очередь, если её там ещё нет.
+    """
+    missing = [
+        post for post in posts if post.image and not post.image_variants
+    ]
+    if not missing:
+        return
+    queued = cache.get_many([JOB_KEY.format(post.pk) for post in missing])
+    for post in missing:
+        key = JOB_KEY.format(post.pk)
+        if queued.get(key) == post.image.name:
+            continue
+        if cache.add(key, post.image.name, JOB_TIMEOUT):
+            transaction.on_commit(
+                partial(submit, post.pk, post.image.name)
+            )
@@ -0,0 +1,139 @@
+"""
+Материализованная лента подписок.
+
+Новый пост раскладывается по лентам подписчиков автора при записи
+(fan-out-on-write), поэтому ленту пользователя можно прочитать по
+индексу (user, -pub_date, -post) без IN-списка авторов и без
+сортировки: дата поста копируется в запись ленты. Авторы, у которых
+подписчиков не меньше FANOUT_LIMIT, при записи пропускаются: их посты
+подмешиваются при чтении (fan-out-on-read). Когда число подписчиков
+опускается ниже порога, ленты снова читаются только из записей,
+поэтому последние посты автора раскладываются по ним заново.
+"""
+from django.db import connection
+from django.db.models import F, Q
+
+from .models import AuthorStats, Follow, Post, TimelineEntry
+
+FANOUT_LIMIT = 1000
+BACKFILL_POSTS = 500
+BATCH_SIZE = 500
+REBUILD = """
+INSERT INTO posts_timelineentry (user_id, post_id, pub_date)
+SELECT follow.user_id, recent.id, recent.pub_date
+FROM posts_follow follow
+JOIN (
+    SELECT id, author_id, pub_date, ROW_NUMBER() OVER (
+        PARTITION BY author_id ORDER BY pub_date DESC, id DESC
+    ) AS position
+    FROM posts_post
+) recent ON recent.author_id = follow.author_id AND recent.position <= %s
+LEFT JOIN posts_authorstats stats ON stats.user_id = follow.author_id
+WHERE COALESCE(stats.followers_count, 0) < %s
+ORDER BY follow.user_id, recent.id
+"""
+
+
+def is_popular(author_id):
+    return AuthorStats.objects.filter(
+        user_id=author_id, followers_count__gte=FANOUT_LIMIT
+    ).exists()
+
+
+def fan_out_post(post):
+    """Добавляет новый пост в ленты подписчиков автора."""
+    if is_popular(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+         for user_id in followers.iterator()),
+        batch_size=BATCH_SIZE
+    )
+
+
+def add_author(user_id, author_id):
+    """Заполняет ленту последними постами нового автора из подписок."""
+    posts = Post.objects.filter(
+        author_id=author_id
+    ).values_list('pk', 'pub_date')[:BACKFILL_POSTS]
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+         for post_id, pub_date in posts),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+
+def remove_author(user_id, author_id):
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+def refill_former_popular(author_id):
+    """
+    Раскладывает последние посты автора по лентам всех подписчиков,
+    если после отписки он перестал быть популярным: посты, написанные
+    при FANOUT_LIMIT подписчиках и больше, в ленты не попадали.
+    """
+    if not AuthorStats.objects.filter(
+        user_id=author_id, followers_count=FANOUT_LIMIT - 1
+    ).exists():
+        return
+    posts = list(Post.objects.filter(
+        author_id=author_id
+    ).values_list('pk', 'pub_date')[:BACKFILL_POSTS])
+    followers = Follow.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+         for user_id in followers.iterator()
+         for post_id, pub_date in posts),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+
+def follow_feed(user):
+    """
+    Посты авторов, на которых подписан пользователь, с ключом ленты
+    (timeline_date, timeline_post) для TimelinePaginator.
+
+    Без популярных авторов ключ берётся из записей ленты, и страница
+    читается диапазоном индекса timeline_user_pub_date_idx. С ними
+    ключом служат поля самого поста.
+    """
+    posts = Post.objects.feed()
+    popular = list(
+        Follow.objects.filter(
+            user=user, author__stats__followers_count__gte=FANOUT_LIMIT
+        ).values_list('author_id', flat=True)
+    )
+    if not popular:
+        posts = posts.filter(timeline_entries__user=user).annotate(
+            timeline_date=F('timeline_entries__pub_date'),
+            timeline_post=F('timeline_entries__post'),
+        )
+    else:
+        timeline = TimelineEntry.objects.filter(user=user).values('post')
+        posts = posts.filter(
+            Q(pk__in=timeline) | Q(author_id__in=popular)
+        ).annotate(timeline_date=F('pub_date'), timeline_post=F('pk'))
+    return posts.order_by('-timeline_date', '-timeline_post')
+
+
+def rebuild():
+    """
+    Заново заполняет ленты одним запросом: как и add_author, берёт
+    не больше BACKFILL_POSTS последних постов каждого автора.
+
+    Нужно после загрузки через bulk_create, которая не вызывает
+    сигналы. Счётчики подписчиков к этому моменту должны быть верны.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM posts_timelineentry')
+        cursor.execute(REBUILD, [BACKFILL_POSTS, FANOUT_LIMIT])
@@ -0,0 +1,63 @@
+"""
+Приём картинок без пиков памяти.
+
+Загрузка пишется на диск кусками по CHUNK_SIZE, в памяти процесса
+одновременно лежит только один кусок. Всё, что сверх MAX_UPLOAD_SIZE,
+не записывается, а форма по полному размеру отклоняет файл. Размеры
+картинки читаются из заголовка без декодирования пикселей. Слишком
+большие оригиналы уменьшаются до MAX_SIDE по длинной стороне ещё до
+сохранения в MEDIA_ROOT/posts/. JPEG при этом декодируется сразу в
+уменьшенном масштабе (Image.draft).
+"""
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from PIL import Image, ImageOps
+
+CHUNK_SIZE = 64 * 2 ** 10
+MAX_UPLOAD_SIZE = 20 * 2 ** 20
+MAX_PIXELS = 50_000_000
+MAX_SIDE = 2560
+SAVE_OPTIONS = {
+    'JPEG': {'quality': 90, 'optimize': True},
+    'PNG': {'optimize': True},
+    'WEBP': {'quality': 90},
+}
+
+
+class BoundedUploadHandler(TemporaryFileUploadHandler):
+    """Пишет загрузку во временный файл, но не больше MAX_UPLOAD_SIZE."""
+    chunk_size = CHUNK_SIZE
+
+    def receive_data_chunk(self, raw_data, start):
+        allowed = MAX_UPLOAD_SIZE - start
+        if allowed > 0:
+            self.file.write(raw_data[:allowed])
+
+
+def downscale(upload):
+    """
+    Уменьшает загрузку до MAX_SIDE по длинной стороне.
+
+    Картинка перезаписывается в тот же временный файл, поэтому новых
+    файлов не появляется. Небольшие и анимированные картинки не
+    меняются.
+    """
+    upload.seek(0)
+    with Image.open(upload) as image:
+        if (max(image.size) <= MAX_SIDE
+                or getattr(image, 'is_animated', False)):
+            upload.seek(0)
+            return upload
+        image_format = image.format
+        ratio = MAX_SIDE / max(image.size)
+        image.draft(
+            image.mode,
+            (round(image.width * ratio), round(image.height * ratio))
+        )
+        resized = ImageOps.exif_transpose(image)
+    resized.thumbnail((MAX_SIDE, MAX_SIDE), Image.LANCZOS)
+    upload.seek(0)
+    upload.truncate()
+    resized.save(upload, image_format, **SAVE_OPTIONS.get(image_format, {}))
+    upload.size = upload.tell()
+    upload.seek(0)
+    return upload
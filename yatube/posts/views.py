@@ -1,31 +1,74 @@
+from urllib.parse import urlencode
+
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
-from django.http import HttpResponseRedirect
+from django.db.models import BooleanField, Exists, OuterRef, Value
+from django.http import Http404, HttpResponseRedirect, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.template.loader import render_to_string
+
+from core.db import serialized_write
+from core.routers import replica_reads
 
+from . import live, page_cache
+from .cards import attach_card_versions
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
+from .models import Comment, Follow, Group, Post, User
+from .paginators import CommentPaginator, TimelinePaginator, paginate
+from .search import SearchResults
+from .thumbnails import prefetch_thumbnails, schedule_thumbnail
+from .timeline import follow_feed
 
 POSTS_COUNT = 10
+COMMENTS_COUNT = 20
+
+
+def with_viewer_follows(queryset, user, author='pk'):
+    """
+    Флаг viewer_follows (user подписан на автора) тем же запросом.
+
+    Подзапрос EXISTS вместо отдельного .exists() экономит обращение
+    к базе на каждой странице автора и поста.
+    """
+    if not user.is_authenticated:
+        return queryset.annotate(
+            viewer_follows=Value(False, output_field=BooleanField())
+        )
+    return queryset.annotate(viewer_follows=Exists(
+        Follow.objects.filter(user=user, author=OuterRef(author))
+    ))
 
 
+@replica_reads
 def index(request):
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, POSTS_COUNT)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = Post.objects.feed()
+    page_obj = paginate(request, post_list, POSTS_COUNT)
+
+    def render_page():
+        prefetch_thumbnails(page_obj)
+        return render_to_string(
+            'posts/includes/index_page.html', {'page_obj': page_obj}, request
+        )
+
     context = {
-        'page_obj': page_obj
+        'page_obj': page_obj,
+        'index_page': page_cache.cached_index_page(
+            page_cache.index_page_version(request), page_obj, render_page
+        ),
+        'live_feed': 'index',
+        'live_since': live.format_since(live.latest()),
+        'live_interval': live.POLL_INTERVAL,
     }
     return render(request, 'posts/index.html', context)
 
 
+@replica_reads
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    paginator = Paginator(post_list, POSTS_COUNT)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = Post.objects.feed().filter(group=group)
+    page_obj = paginate(request, post_list, POSTS_COUNT)
+    attach_card_versions(page_obj)
+    prefetch_thumbnails(page_obj)
     context = {
         'group': group,
         'page_obj': page_obj,
@@ -33,49 +76,119 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@replica_reads
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
-    paginator = Paginator(posts, POSTS_COUNT)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    user = request.user
-    following = user.is_authenticated and author.following.exists()
+    author = get_object_or_404(
+        with_viewer_follows(
+            User.objects.select_related('stats'), request.user
+        ),
+        username=username
+    )
+    posts = Post.objects.feed().filter(author=author)
+    page_obj = paginate(request, posts, POSTS_COUNT)
+    attach_card_versions(page_obj)
+    prefetch_thumbnails(page_obj)
     context = {
         'author': author,
         'page_obj': page_obj,
-        'following': following,
+        'following': author.viewer_follows,
     }
     return render(request, 'posts/profile.html', context)
 
 
+def search(request):
+    query = request.GET.get('q', '').strip()
+    results = SearchResults(query, Post.objects.feed())
+    page_obj = Paginator(results, POSTS_COUNT).get_page(
+        request.GET.get('page')
+    )
+    attach_card_versions(page_obj)
+    prefetch_thumbnails(page_obj)
+    context = {
+        'query': query,
+        'query_string': urlencode({'q': query}) + '&',
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/search.html', context)
+
+
+def comment_page(request, post_id):
+    """Страница комментариев поста по курсору, авторы одним JOIN."""
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author'
+    ).only('text', 'created', 'author__username')
+    paginator = CommentPaginator(comments, COMMENTS_COUNT)
+    return paginator.get_cursor_page(request.GET.get('cursor'))
+
+
+def post_comments(request, post_id):
+    """Следующие комментарии поста: HTML-фрагмент или JSON."""
+    if not Post.objects.filter(pk=post_id).exists():
+        raise Http404
+    comments = comment_page(request, post_id)
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'comments': [
+                {
+                    'id': comment.pk,
+                    'author': comment.author.username,
+                    'text': comment.text,
+                    'created': comment.created.isoformat(),
+                }
+                for comment in comments
+            ],
+            'next_cursor': comments.next_cursor,
+        })
+    context = {
+        'post_id': post_id,
+        'comments': comments,
+    }
+    return render(request, 'posts/includes/comments.html', context)
+
+
+@replica_reads
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    form = CommentForm()
-    comments = post.comments.all()
-    following = (
-        request.user.is_authenticated
-        and post.author.following.filter(user=request.user).exists()
+    post = get_object_or_404(
+        with_viewer_follows(
+            Post.objects.select_related('author__stats', 'group'),
+            request.user,
+            author='author'
+        ),
+        pk=post_id
     )
+    prefetch_thumbnails([post])
+    form = CommentForm()
+    comments = comment_page(request, post.pk)
     context = {
         'post': post,
+        'post_id': post.pk,
         'comments': comments,
-        'following': following,
+        'following': post.viewer_follows,
         'form': form
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+def store_image(post):
+    """Кладёт новую картинку в хранилище до транзакции записи."""
+    if post.image and not post.image._committed:
+        post.image.save(post.image.name, post.image.file, save=False)
+
+
 @login_required
 def post_create(request):
     if request.method == "POST":
-        form = PostForm(request.POST)
+        form = PostForm(request.POST, files=request.FILES or None)
         if form.is_valid():
             post = form.save(commit=False)
             post.author = request.user
-            post.save()
+            store_image(post)
+            serialized_write(post.save)
+            if post.image:
+                schedule_thumbnail(post)
             return redirect('posts:profile', username=request.user)
-    form = PostForm()
+    else:
+        form = PostForm()
     return render(request, 'posts/create_post.html', {'form': form})
 
 
@@ -92,11 +205,13 @@ def post_edit(request, post_id):
         instance=post
     )
     if form.is_valid():
-        form.save()
+        store_image(form.instance)
+        serialized_write(form.save)
+        if 'image' in form.changed_data:
+            schedule_thumbnail(post)
         return redirect(post)
     if request.user != post.author:
         return redirect(post)
-    form = PostForm(instance=post)
     context = {
         'is_edit': True,
         'form': form,
@@ -114,20 +229,24 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        serialized_write(comment.save)
     return redirect(post)
 
 
 @login_required
+@replica_reads
 def follow_index(request):
-    user = request.user
-    authors = user.follower.values_list('author', flat=True)
-    posts_list = Post.objects.filter(author__id__in=authors)
-    paginator = Paginator(posts_list, POSTS_COUNT)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    posts_list = follow_feed(request.user)
+    page_obj = paginate(
+        request, posts_list, POSTS_COUNT, TimelinePaginator
+    )
+    attach_card_versions(page_obj)
+    prefetch_thumbnails(page_obj)
     context = {
         'page_obj': page_obj,
+        'live_feed': 'follow',
+        'live_since': live.format_since(live.latest()),
+        'live_interval': live.POLL_INTERVAL,
     }
     return render(
         request,
@@ -141,7 +260,9 @@ def profile_follow(request, username):
     author = User.objects.get(username=username)
     user = request.user
     if author != user:
-        Follow.objects.get_or_create(user=user, author=author)
+        serialized_write(
+            Follow.objects.get_or_create, user=user, author=author
+        )
         return redirect(
             'posts:profile',
             username=username
@@ -152,5 +273,6 @@ def profile_follow(request, username):
 @login_required
 def profile_unfollow(request, username):
     user = request.user
-    Follow.objects.get(user=user, author__username=username).delete()
+    follow = Follow.objects.get(user=user, author__username=username)
+    serialized_write(follow.delete)
     return HttpResponseRedirect(request.META.get('HTTP_REFERER'))
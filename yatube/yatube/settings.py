@@ -29,9 +29,26 @@ ALLOWED_HOSTS = ['*']
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
+# По умолчанию кэш свой у каждого процесса. Чтобы воркеры делили
+# один кэш, задайте общий бэкенд с атомарным add, например memcached
+# (клиент python-memcached есть в requirements.txt):
+# CACHE_BACKEND=django.core.cache.backends.memcached.MemcachedCache
+# CACHE_LOCATION=127.0.0.1:11211
+# На add держится блокировка пересчёта в core/cache.py. У FileBasedCache
+# add не атомарен: с ним фрагмент иногда пересчитывают сразу несколько
+# воркеров, поэтому для общего кэша под нагрузкой он не годится.
+# InstrumentedCache считает попадания и промахи для core/metrics.py и
+# передаёт вызовы настоящему бэкенду из OPTIONS['BACKEND'].
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.backends.InstrumentedCache',
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+        'OPTIONS': {
+            'BACKEND': os.getenv(
+                'CACHE_BACKEND',
+                'django.core.cache.backends.locmem.LocMemCache'
+            ),
+        },
     }
 }
 
@@ -55,7 +72,12 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 MEDIA_URL = '/media/'
 
+# Загрузки всегда пишутся на диск кусками, см. posts/uploads.py.
+FILE_UPLOAD_HANDLERS = ['posts.uploads.BoundedUploadHandler']
+
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.ProfilerMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -63,15 +85,51 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.ReplicaStickinessMiddleware',
 ]
 
+# Метрики запросов (core/metrics.py): заголовок Server-Timing и
+# /metrics в формате Prometheus. Если задан METRICS_TOKEN, /metrics
+# отдаётся по заголовку Authorization: Bearer <токен>. Иначе только
+# прямым запросам с этих адресов: запрос с заголовками прокси
+# (X-Forwarded-For и подобными) получает 404. За обратным прокси,
+# который таких заголовков не ставит, задайте токен.
+METRICS_SERVER_TIMING = True
+
+METRICS_ALLOWED_IPS = os.getenv(
+    'METRICS_ALLOWED_IPS', '127.0.0.1,::1'
+).split(',')
+
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# Выборочный профилировщик медленных запросов (core/profiling.py),
+# по умолчанию выключен. Профиль пишется для запросов дольше
+# PROFILER_THRESHOLD секунд или с заголовком X-Profile: PROFILER_TOKEN.
+PROFILER_ENABLED = os.getenv('PROFILER_ENABLED', '') == '1'
+
+PROFILER_THRESHOLD = float(os.getenv('PROFILER_THRESHOLD', 1))
+
+PROFILER_TOKEN = os.getenv('PROFILER_TOKEN', '')
+
+PROFILER_DIR = os.getenv(
+    'PROFILER_DIR', os.path.join(BASE_DIR, 'profiles')
+)
+
+PROFILER_INTERVAL = 0.01
+
+PROFILER_MAX_ACTIVE = 8
+
+PROFILER_MAX_DUMPS = 5
+
+PROFILER_PERIOD = 60 * 10
+
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.backends.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -92,13 +150,57 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# DB_PROFILE=production включает боевой режим SQLite: журнал WAL, прагмы
+# SQLITE_PRODUCTION_PRAGMAS (их выполняет core/db.py для каждого нового
+# соединения) и постоянные соединения на DB_CONN_MAX_AGE секунд.
+DB_PROFILE = os.getenv('DB_PROFILE', 'development')
+
+SQLITE_PRODUCTION_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 2 ** 20,
+    'cache_size': -64 * 2 ** 10,
+    'temp_store': 'MEMORY',
+}
+
+SQLITE_PRAGMAS = (
+    SQLITE_PRODUCTION_PRAGMAS if DB_PROFILE == 'production' else {}
+)
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': int(os.getenv(
+            'DB_CONN_MAX_AGE', 600 if DB_PROFILE == 'production' else 0
+        )),
+        'OPTIONS': {
+            'timeout': 20 if DB_PROFILE == 'production' else 5,
+        },
     }
 }
 
+# Реплики для чтения: DB_REPLICAS=/srv/replica1.sqlite3,/srv/replica2.sqlite3
+# Ленты и страницы постов читают из них (core/routers.py), после своей
+# записи пользователь REPLICA_STICKY_SECONDS секунд читает из default.
+# Локально реплики можно заполнить копией базы: manage.py sync_replicas.
+READ_REPLICAS = []
+
+for number, path in enumerate(filter(None, os.getenv(
+    'DB_REPLICAS', ''
+).split(',')), 1):
+    alias = f'replica_{number}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'NAME': path,
+        'TEST': {'MIRROR': 'default'},
+    }
+    READ_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+
+REPLICA_STICKY_SECONDS = int(os.getenv('DB_REPLICA_STICKY_SECONDS', 10))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators